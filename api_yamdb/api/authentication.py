@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.enums import UserRole
+from users.models import TOKEN_CLAIM_FIELDS, User, UserRoleMixin
+from .cache import get_cache
+
+VERSION_CLAIM = 'ver'
+TOKEN_VERSION_KEY = 'auth:token-version:{}'
+
+
+class DecodedTokenCache:
+    """Ограниченный LRU-кэш проверенных токенов по их строке."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.tokens = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, raw_token):
+        with self.lock:
+            token = self.tokens.get(raw_token)
+            if token is None:
+                return None
+            self.tokens.move_to_end(raw_token)
+        try:
+            token.check_exp()
+        except TokenError:
+            self.discard(raw_token)
+            return None
+        return token
+
+    def put(self, raw_token, token):
+        with self.lock:
+            self.tokens[raw_token] = token
+            self.tokens.move_to_end(raw_token)
+            while len(self.tokens) > self.maxsize:
+                self.tokens.popitem(last=False)
+
+    def discard(self, raw_token):
+        with self.lock:
+            self.tokens.pop(raw_token, None)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+
+decoded_tokens = DecodedTokenCache(settings.JWT_DECODED_TOKEN_CACHE_SIZE)
+
+
+class RoleAccessToken(AccessToken):
+    """Токен доступа с ролью и версией токенов пользователя."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in TOKEN_CLAIM_FIELDS:
+            token[field] = getattr(user, field)
+        token[VERSION_CLAIM] = user.token_version
+        return token
+
+
+class ClaimsUser(UserRoleMixin, TokenUser):
+    """Пользователь, собранный из утверждений токена без запроса к базе."""
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', UserRole.USER.value)
+
+
+def get_token_version(user_id):
+    """
+    Текущая версия токенов пользователя.
+
+    Версия хранится в кэше ответов API; при промахе читается из базы.
+    None означает, что пользователя больше нет. Запись в кэше живёт
+    JWT_TOKEN_VERSION_TTL секунд: кэш процесса не видит отзывов токенов
+    в других процессах и массовых изменений в обход сигналов.
+    """
+    cache = get_cache()
+    key = TOKEN_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list(
+            'token_version', flat=True
+        ).first()
+        if version is not None:
+            cache.add(key, version, settings.JWT_TOKEN_VERSION_TTL)
+    return version
+
+
+def set_token_version(user_id, version):
+    key = TOKEN_VERSION_KEY.format(user_id)
+    if version is None:
+        get_cache().delete(key)
+    else:
+        get_cache().set(key, version, settings.JWT_TOKEN_VERSION_TTL)
+
+
+def load_user(user):
+    """Модель пользователя для запросов, которым нужна вся строка."""
+    if isinstance(user, User):
+        return user
+    return User.objects.get(pk=user.pk)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без загрузки пользователя на каждый запрос.
+
+    Подпись проверяется один раз на токен, дальше он берётся из LRU.
+    Права читаются из утверждений RoleAccessToken, пока версия в токене
+    совпадает с версией пользователя. Иначе (смена роли, блокировка,
+    удаление или токен старого формата) пользователь загружается из базы
+    обычным путём simplejwt.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = decoded_tokens.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            decoded_tokens.put(raw_token, token)
+        return token
+
+    def get_user(self, validated_token):
+        version = validated_token.get(VERSION_CLAIM)
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if version is None or version != get_token_version(user_id):
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
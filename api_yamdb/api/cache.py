@@ -0,0 +1,66 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+CACHE_STATUS_HEADER = 'X-Cache'
+VERSION_KEY = 'api:version:{}'
+RESPONSE_KEY = 'api:response:{versions}:{digest}'
+
+
+def get_cache():
+    return caches[settings.API_RESPONSE_CACHE]
+
+
+def get_versions(namespaces):
+    """
+    Возвращает текущие версии пространств имён кэша.
+
+    Потерянная версия заводится заново от текущего времени, поэтому
+    вытесненный счётчик не может «воскресить» старые ответы.
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        key = VERSION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate(*namespaces):
+    """Сбрасывает пространства имён после фиксации транзакции."""
+    transaction.on_commit(lambda: bump_versions(*namespaces))
+
+
+def response_key(request, namespaces):
+    """
+    Ключ ответа по адресу, нормализованной строке запроса и версиям.
+
+    Схема и хост входят в ключ: ссылки next/previous в ответе абсолютные.
+    """
+    query = urlencode(
+        sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        ),
+        doseq=True
+    )
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    versions = ':'.join(map(str, get_versions(namespaces)))
+    return RESPONSE_KEY.format(versions=versions, digest=digest)
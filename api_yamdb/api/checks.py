@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_api_cache(app_configs, **kwargs):
+    """
+    Счётчики ограничения частоты и время последней записи пользователя
+    для реплики должны быть общими для процессов.
+    """
+    if not isinstance(caches[settings.API_RESPONSE_CACHE], LocMemCache):
+        return []
+    return [Warning(
+        'Кэш API_RESPONSE_CACHE хранится в памяти процесса.',
+        hint=(
+            'При нескольких процессах ограничения частоты считаются '
+            'в каждом отдельно, а после записи пользователь может прочитать '
+            'старые данные из реплики. Укажите общий кэш: filebased, '
+            'memcached или redis.'
+        ),
+        id='api.W001',
+    )]
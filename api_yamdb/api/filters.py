@@ -1,6 +1,21 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from reviews.models import Title
+from reviews.models import Category, Genre, Title
+
+GENRE_MODE_ANY = 'any'
+GENRE_MODE_ALL = 'all'
+GENRE_MODES = (
+    (GENRE_MODE_ANY, 'Любой из жанров'),
+    (GENRE_MODE_ALL, 'Все жанры'),
+)
+
+
+def split_slugs(value):
+    """Разбирает список слагов через запятую без пустых и повторов."""
+    return list(dict.fromkeys(
+        slug.strip() for slug in value.split(',') if slug.strip()
+    ))
 
 
 class TitleFilter(filters.FilterSet):
@@ -10,14 +25,13 @@ class TitleFilter(filters.FilterSet):
         field_name='name',
         lookup_expr='contains'
     )
-    category = filters.CharFilter(
-        field_name='category__slug',
-        lookup_expr='contains'
-    )
-    genre = filters.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='contains'
+    category = filters.CharFilter(method='filter_category')
+    genre = filters.CharFilter(method='filter_genre')
+    genre_mode = filters.ChoiceFilter(
+        choices=GENRE_MODES,
+        method='filter_genre_mode'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
@@ -27,3 +41,35 @@ class TitleFilter(filters.FilterSet):
             'genre',
             'category',
         )
+
+    def filter_category(self, queryset, name, value):
+        return queryset.filter(
+            category_id__in=Category.objects.filter(
+                slug__in=split_slugs(value)
+            ).values('id')
+        )
+
+    def filter_genre(self, queryset, name, value):
+        # Подзапросы EXISTS по таблице связей не размножают строки
+        # произведений, в отличие от JOIN по genre__slug.
+        slugs = split_slugs(value)
+        links = Title.genre.through.objects.filter(title_id=OuterRef('pk'))
+        mode = self.form.cleaned_data.get('genre_mode') or GENRE_MODE_ANY
+        if mode == GENRE_MODE_ANY:
+            return queryset.filter(Exists(links.filter(
+                genre_id__in=Genre.objects.filter(
+                    slug__in=slugs
+                ).values('id')
+            )))
+        for slug in slugs:
+            queryset = queryset.filter(Exists(links.filter(
+                genre_id__in=Genre.objects.filter(slug=slug).values('id')
+            )))
+        return queryset
+
+    def filter_genre_mode(self, queryset, name, value):
+        # Режим учитывается в filter_genre.
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value)
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.replica import refresh_replica
+
+
+class Command(BaseCommand):
+    help = 'Обновление реплики для чтения копией основной базы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а обновлять реплику каждые --interval с.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.REPLICA_MAX_LAG / 2,
+            help='Пауза между обновлениями в режиме --loop.'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.READ_REPLICA:
+            raise CommandError('Реплика отключена: READ_REPLICA = None.')
+        while True:
+            duration = refresh_replica()
+            self.stdout.write(self.style.SUCCESS(
+                f'Реплика обновлена за {duration:.2f} с'
+            ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -1,14 +1,182 @@
+import hashlib
+from http import HTTPStatus
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin)
 from rest_framework import filters
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 
+from reviews.models import Title
+from .cache import CACHE_STATUS_HEADER, get_cache, response_key
 from .permissions import IsAdminOrUserOrReadOnly
+from .replica import read_alias, remember_write, replica_snapshot
+
+
+class CachedResponseMixin:
+    """
+    Кэширует ответы на анонимные запросы чтения.
+
+    Ключ строится из пространств имён, которые сбрасываются сигналами
+    при изменении данных (см. api.signals).
+    """
+
+    cache_namespace = None
+
+    def get_cache_namespaces(self):
+        if self.action == 'retrieve':
+            lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            return (
+                self.cache_namespace, f'{self.cache_namespace}:{lookup}'
+            )
+        return (self.cache_namespace, f'{self.cache_namespace}:list')
+
+    def get_response_key(self, request):
+        return response_key(request, self.get_cache_namespaces())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        cache = get_cache()
+        key = self.get_response_key(request)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response[CACHE_STATUS_HEADER] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == HTTPStatus.OK:
+            cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+        response[CACHE_STATUS_HEADER] = 'MISS'
+        return response
+
+
+class CachedListMixin(CachedResponseMixin):
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class TitleConditionalMixin:
+    """
+    Условные GET-запросы по версии произведения.
+
+    ETag и Last-Modified берутся из одной строки произведения, поэтому
+    при совпадении ответ 304 отдаётся без сериализации и агрегатов.
+    """
+
+    conditional_actions = ('list', 'retrieve')
+    title_url_kwarg = 'title_id'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+        try:
+            stamp = Title.objects.filter(
+                pk=self.kwargs[self.title_url_kwarg]
+            ).values_list('version', 'modified').first()
+        except (TypeError, ValueError):
+            # Некорректный id: ответ 404 отдаст поиск объекта DRF.
+            stamp = None
+        if stamp is None:
+            return handler(request, *args, **kwargs)
+        version, modified = stamp
+        digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        etag = quote_etag(
+            f'{version}-{modified.timestamp():.6f}-{digest[:12]}'
+        )
+        last_modified = int(modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code == HTTPStatus.OK:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CursorPaginationMixin:
+    """Переключает список на курсорную пагинацию по параметру запроса."""
+
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and self.cursor_pagination_class.is_requested(self.request)):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+class ReadReplicaMixin:
+    """
+    Отдаёт запросы чтения из реплики (см. api.replica).
+
+    Аутентификация и проверка прав идут по основной базе, на реплику
+    переключается только обработчик GET/HEAD. После успешной записи
+    пользователь читает из основной базы, пока реплика его не догонит.
+    Ответы из реплики кэшируются отдельно для каждого снимка: сброс кэша
+    при записи не должен закреплять в нём данные старого снимка.
+    """
+
+    replica_snapshot = None
+
+    def dispatch(self, request, *args, **kwargs):
+        token = read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            self.replica_snapshot = replica_snapshot(request.user)
+        if self.replica_snapshot is not None:
+            read_alias.set(settings.READ_REPLICA)
+
+    def get_response_key(self, request):
+        key = super().get_response_key(request)
+        if self.replica_snapshot is None:
+            return key
+        return f'{key}:replica:{self.replica_snapshot}'
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in SAFE_METHODS
+                and response.status_code < HTTPStatus.BAD_REQUEST
+                and request.user.is_authenticated):
+            remember_write(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
 
 
-class CategoryGenreViewSet(CreateModelMixin, ListModelMixin,
-                           DestroyModelMixin, GenericViewSet):
+class CategoryGenreViewSet(ReadReplicaMixin, CachedListMixin, CreateModelMixin,
+                           ListModelMixin, DestroyModelMixin,
+                           GenericViewSet):
     filter_backends = (DjangoFilterBackend, filters.SearchFilter)
     filterset_fields = ('name', 'slug')
     permission_classes = (IsAdminOrUserOrReadOnly,)
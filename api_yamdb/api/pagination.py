@@ -0,0 +1,185 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация по паре (ключ сортировки, id).
+
+    Страница выбирается условием WHERE по последнему показанному ключу,
+    поэтому её стоимость не зависит от глубины, а COUNT(*) не выполняется.
+    Ключ идёт по убыванию, id - по возрастанию или, с descending_pk,
+    по убыванию. Пустые значения ключа идут в конце выдачи, как при
+    сортировке SQLite по убыванию.
+    """
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    mode_query_value = 'cursor'
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering_field = None
+    descending_pk = False
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    @classmethod
+    def is_requested(cls, request):
+        """Курсорный режим включается параметром запроса."""
+        params = request.query_params
+        return (
+            params.get(cls.mode_query_param) == cls.mode_query_value
+            or cls.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.field = queryset.model._meta.get_field(self.ordering_field)
+        key, pk, reverse = self.decode_cursor(request)
+        forward_pk, backward_pk = (
+            ('-id', 'id') if self.descending_pk else ('id', '-id')
+        )
+        if reverse:
+            queryset = queryset.filter(self.before(key, pk)).order_by(
+                self.ordering_field, backward_pk
+            )
+        else:
+            if pk is not None:
+                queryset = queryset.filter(self.after(key, pk))
+            queryset = queryset.order_by(
+                f'-{self.ordering_field}', forward_pk
+            )
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, pk is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    @property
+    def pk_lookups(self):
+        """Условия на id для соседних объектов с равным ключом."""
+        if self.descending_pk:
+            return 'id__lt', 'id__gt'
+        return 'id__gt', 'id__lt'
+
+    def after(self, key, pk):
+        """Объекты, идущие после (key, pk) в прямом порядке."""
+        field = self.ordering_field
+        pk_after, _ = self.pk_lookups
+        if key is None:
+            return Q(**{f'{field}__isnull': True, pk_after: pk})
+        condition = (
+            Q(**{f'{field}__lt': key}) | Q(**{field: key, pk_after: pk})
+        )
+        if self.field.null:
+            condition |= Q(**{f'{field}__isnull': True})
+        return condition
+
+    def before(self, key, pk):
+        """Объекты, идущие перед (key, pk) в прямом порядке."""
+        field = self.ordering_field
+        _, pk_before = self.pk_lookups
+        if key is None:
+            return (
+                Q(**{f'{field}__isnull': False})
+                | Q(**{f'{field}__isnull': True, pk_before: pk})
+            )
+        return (
+            Q(**{f'{field}__gt': key}) | Q(**{field: key, pk_before: pk})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None, False
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            key = tokens['k'][0]
+            return (
+                self.field.to_python(key) if key else None,
+                int(tokens['i'][0]),
+                bool(int(tokens.get('r', ['0'])[0])),
+            )
+        except (TypeError, ValueError, KeyError, UnicodeError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        key = getattr(obj, self.ordering_field)
+        tokens = {
+            'k': '' if key is None else self.field.value_to_string(obj),
+            'i': obj.pk,
+        }
+        if reverse:
+            tokens['r'] = 1
+        encoded = b64encode(parse.urlencode(tokens).encode('ascii'))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode('ascii')
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class TitleCursorPagination(KeysetPagination):
+    """Курсорная пагинация произведений по (rating, id)."""
+
+    ordering_field = 'rating'
+
+
+class PubDateCursorPagination(KeysetPagination):
+    """Курсорная пагинация отзывов и комментариев: сначала новые."""
+
+    ordering_field = 'pub_date'
+    descending_pk = True
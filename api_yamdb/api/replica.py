@@ -0,0 +1,118 @@
+"""
+Реплика для чтения.
+
+Реплика - копия основной SQLite-базы, которую периодически обновляет
+refresh_replica через online backup API. Запросы на чтение попадают в неё
+только внутри use_replica(); остальное роутер оставляет на основной базе.
+Время снимка записывается в сам файл реплики, поэтому его видят все
+процессы. Время последней записи пользователя лежит в кэше ответов API:
+чтобы пользователь видел свои записи при нескольких процессах, кэш
+должен быть общим (filebased, memcached и т. п.).
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from .cache import get_cache
+
+LAST_WRITE_KEY = 'replica:write:{}'
+# Таблица с временем снимка; создаётся только в файле реплики.
+SNAPSHOT_TABLE = 'replica_snapshot'
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+class ReadReplicaRouter:
+    """Чтение - из выбранного для запроса алиаса, запись - в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплики приходит вместе с копией основной базы.
+        return db == 'default'
+
+
+@contextmanager
+def use_replica():
+    token = read_alias.set(settings.READ_REPLICA)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+def snapshot_time():
+    """Время начала снимка в реплике или None, если снимка нет."""
+    try:
+        with connections[settings.READ_REPLICA].cursor() as cursor:
+            cursor.execute(f'SELECT refreshed FROM {SNAPSHOT_TABLE}')
+            row = cursor.fetchone()
+    except DatabaseError:
+        # Реплика ещё не создана или как раз обновляется.
+        return None
+    return row and row[0]
+
+
+def replica_snapshot(user):
+    """
+    Время снимка, если из реплики можно читать для этого пользователя.
+
+    Снимок должен быть не старше REPLICA_MAX_LAG и, для пользователя,
+    который недавно писал, начат после его последней записи.
+    """
+    if not settings.READ_REPLICA:
+        return None
+    refreshed = snapshot_time()
+    if refreshed is None or time.time() - refreshed > settings.REPLICA_MAX_LAG:
+        return None
+    if user.is_authenticated:
+        last_write = get_cache().get(LAST_WRITE_KEY.format(user.pk))
+        if last_write is not None and refreshed <= last_write:
+            return None
+    return refreshed
+
+
+def remember_write(user):
+    """Направляет чтения пользователя в основную базу до нового снимка."""
+    get_cache().set(
+        LAST_WRITE_KEY.format(user.pk), time.time(), settings.REPLICA_MAX_LAG
+    )
+
+
+def refresh_replica(source=None, target=None):
+    """
+    Копирует основную базу в файл реплики online backup API.
+
+    Копия снимается за один шаг: в режиме WAL это не блокирует писателей,
+    а читатели реплики видят новые данные со следующей транзакции.
+    Пока время снимка не записано, реплика считается неготовой.
+    """
+    source = source or settings.DATABASES['default']['NAME']
+    target = target or settings.DATABASES[settings.READ_REPLICA]['NAME']
+    started = time.time()
+    source_connection = sqlite3.connect(str(source))
+    target_connection = sqlite3.connect(str(target))
+    try:
+        source_connection.backup(target_connection)
+        with target_connection:
+            target_connection.execute(
+                f'CREATE TABLE {SNAPSHOT_TABLE} (refreshed REAL NOT NULL)'
+            )
+            target_connection.execute(
+                f'INSERT INTO {SNAPSHOT_TABLE} VALUES (?)', (started,)
+            )
+    finally:
+        target_connection.close()
+        source_connection.close()
+    return time.time() - started
@@ -1,35 +1,57 @@
 from django.contrib.auth.tokens import default_token_generator
-from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
-from api_yamdb.settings import EMAIL_HOST_USER
 from reviews.models import Comment, Title, Review, Category, Genre
 from users.models import User, MAX_EMAIL_LENGTH, MAX_FIELD_LENGTH
+from users.outbox import enqueue
 from users.validators import validate_username
 
+DUPLICATE_REVIEW = 'Нельзя дублировать отзыв!'
+
+
+class AuthorUsernameField(serializers.ReadOnlyField):
+    """
+    Имя автора без отдельного запроса к таблице пользователей.
+
+    Вьюсеты аннотируют выборку полем author_username, а автор только что
+    созданного объекта - это пользователь запроса.
+    """
+
+    def get_attribute(self, instance):
+        username = getattr(instance, 'author_username', None)
+        if username is not None:
+            return username
+        user = self.context['request'].user
+        if instance.author_id == user.pk:
+            return user.username
+        return instance.author.username
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     """Сериализатор отзывов."""
 
-    author = serializers.SlugRelatedField(
-        slug_field='username',
+    author = AuthorUsernameField()
+    comments_count = serializers.IntegerField(
+        source='comment_count',
         read_only=True
     )
 
-    def validate(self, data):
-        request = self.context['request']
-        if request.method != 'POST':
-            return data
-        author = request.user
-        title_id = self.context.get('view').kwargs.get('title_id')
-        if Review.objects.filter(title=title_id, author=author).exists():
-            raise ValidationError('Нельзя дублировать отзыв!')
-        return data
+    def create(self, validated_data):
+        # Повторный отзыв отсекает уникальное ограничение (title, author),
+        # отдельный запрос exists() перед вставкой не нужен.
+        try:
+            return super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_REVIEW]}
+            )
 
     class Meta:
-        fields = ('id', 'text', 'pub_date', 'score', 'author')
+        fields = (
+            'id', 'text', 'pub_date', 'score', 'author', 'comments_count'
+        )
         model = Review
         extra_kwargs = {
             'title': {'write_only': True},
@@ -39,10 +61,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     """Сериализатор комментариев к отзывам."""
 
-    author = serializers.SlugRelatedField(
-        slug_field='username',
-        read_only=True
-    )
+    author = AuthorUsernameField()
 
     class Meta:
         fields = ('id', 'text', 'pub_date', 'author')
@@ -89,7 +108,15 @@ class TitleGetSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id',
+            'name',
+            'year',
+            'rating',
+            'description',
+            'genre',
+            'category',
+        )
         read_only_fields = (
             'id',
             'name',
@@ -112,10 +139,17 @@ class TitleSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Title
-        fields = '__all__'
+        fields = (
+            'id',
+            'name',
+            'year',
+            'description',
+            'genre',
+            'category',
+        )
 
     def to_representation(self, instance):
-        return TitleGetSerializer(instance).data
+        return TitleGetSerializer(instance, context=self.context).data
 
 
 class SignUpSerializer(serializers.Serializer):
@@ -130,26 +164,40 @@ class SignUpSerializer(serializers.Serializer):
         validators=(validate_username,)
     )
 
-    def create(self, validated_data):
+    def get_or_create_user(self, username, email):
+        """
+        Новый пользователь или существующий с той же парой имя-почта.
+
+        Сначала пробуем вставку: для новой регистрации это единственный
+        запрос к таблице пользователей, а повторная упрётся в уникальные
+        индексы и прочитает строку по имени.
+        """
         try:
-            user, created = User.objects.get_or_create(
-                username=validated_data.get('username'),
-                email=validated_data.get('email'),
-            )
+            with transaction.atomic():
+                return User.objects.create(username=username, email=email)
         except IntegrityError:
+            user = User.objects.filter(username=username).first()
+        if user is None or user.email != email:
             raise serializers.ValidationError(
                 {
                     'detail': ['Имя пользователя или почта уже заняты.']
                 }
             )
-        send_mail(
-            'Подтверждение регистрации',
-            'Код подтверждения: '
-            f'{default_token_generator.make_token(user)}',
-            EMAIL_HOST_USER,
-            [user.email],
-            fail_silently=False,
-        )
+        return user
+
+    def create(self, validated_data):
+        # Пользователь и письмо с кодом сохраняются вместе, само письмо
+        # уходит из очереди, и запрос не ждёт почтовый сервер.
+        with transaction.atomic():
+            user = self.get_or_create_user(
+                validated_data['username'], validated_data['email']
+            )
+            enqueue(
+                'Подтверждение регистрации',
+                'Код подтверждения: '
+                f'{default_token_generator.make_token(user)}',
+                user.email,
+            )
         return user
 
 
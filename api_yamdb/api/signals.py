@@ -0,0 +1,54 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from django.db import transaction
+
+from reviews.models import Category, Genre, Review, Title
+from reviews.deleting import is_deleting
+from users.models import User
+from .authentication import set_token_version
+from .cache import invalidate
+
+
+@receiver((post_save, post_delete), sender=Title)
+def invalidate_title(sender, instance, **kwargs):
+    invalidate('titles:list', f'titles:{instance.pk}')
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_title_genres(sender, instance, **kwargs):
+    if isinstance(instance, Title):
+        invalidate('titles:list', f'titles:{instance.pk}')
+    else:
+        invalidate('titles')
+
+
+@receiver((post_save, post_delete), sender=Review)
+def invalidate_review_title(sender, instance, **kwargs):
+    # Отзыв меняет рейтинг, а значит и порядок в списке произведений.
+    if not is_deleting(Title, instance.title_id):
+        invalidate('titles:list', f'titles:{instance.title_id}')
+
+
+@receiver((post_save, post_delete), sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    # Категория встроена в каждое произведение.
+    invalidate('categories:list', 'titles')
+
+
+@receiver((post_save, post_delete), sender=Genre)
+def invalidate_genre(sender, instance, **kwargs):
+    invalidate('genres:list', 'titles')
+
+
+@receiver(post_save, sender=User)
+def publish_token_version(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: set_token_version(instance.pk, instance.token_version)
+    )
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: set_token_version(user_id, None))
@@ -0,0 +1,91 @@
+import math
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from .cache import get_cache
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты по скользящему окну из двух счётчиков.
+
+    Вместо истории запросов хранится число запросов в текущем и
+    предыдущем фиксированных окнах; предыдущее учитывается с весом, равным
+    доле окна, которая ещё не прошла. Проверка стоит одно чтение двух
+    ключей кэша, а принятый запрос - ещё один инкремент.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        window, elapsed = divmod(now, self.duration)
+        current_key = f'{self.key}:{int(window)}'
+        previous_key = f'{self.key}:{int(window) - 1}'
+        counts = self.cache.get_many((current_key, previous_key))
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        self.elapsed = elapsed
+        if self.estimate(elapsed) >= self.num_requests:
+            return False
+        # Ключ живёт два окна: следующее окно читает его как предыдущее.
+        if not self.cache.add(current_key, 1, 2 * self.duration):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                self.cache.set(current_key, 1, 2 * self.duration)
+        return True
+
+    def estimate(self, elapsed):
+        weight = 1 - elapsed / self.duration
+        return self.previous * weight + self.current
+
+    def wait(self):
+        """Секунды до момента, когда оценка опустится ниже лимита."""
+        if self.current >= self.num_requests:
+            # Текущее окно станет предыдущим и должно «остыть».
+            seconds = self.duration - self.elapsed + self.duration * (
+                1 - self.num_requests / self.current
+            )
+        elif not self.previous:
+            seconds = self.duration - self.elapsed
+        else:
+            free = (self.num_requests - self.current) / self.previous
+            seconds = self.duration * (1 - free) - self.elapsed
+        # Retry-After целый и указывает строго за границу ограничения.
+        return max(1, math.floor(seconds) + 1)
+
+
+class AuthRateThrottle(SlidingWindowThrottle):
+    """Регистрация и получение токена: лимит на IP-адрес."""
+
+    scope = 'auth'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class PostRateThrottle(SlidingWindowThrottle):
+    """Создание отзывов и комментариев: лимит на пользователя."""
+
+    scope = 'posts'
+
+    def get_cache_key(self, request, view):
+        if request.method != 'POST' or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': request.user.pk,
+        }
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (ReviewViewSet, CommentViewSet, SignUpView,
                     CategoryViewSet, GenreViewSet, TitleViewSet,
-                    ObtainTokenView, UsersViewSet)
+                    ObtainTokenView, UsersViewSet, ExportView)
 
 router_v1 = DefaultRouter()
 
@@ -33,5 +33,6 @@ auth_urls = [
 
 urlpatterns = [
     path('v1/', include(router_v1.urls)),
-    path('v1/auth/', include(auth_urls))
+    path('v1/auth/', include(auth_urls)),
+    path('v1/export/', ExportView.as_view(), name='export'),
 ]
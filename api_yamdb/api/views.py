@@ -1,15 +1,19 @@
 from django.contrib.auth.tokens import default_token_generator
-from django.db.models import Avg
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework.views import APIView
 
-from api.mixins import CategoryGenreViewSet
+from api.authentication import RoleAccessToken, load_user
+from api.mixins import (CachedListMixin, CachedRetrieveMixin,
+                        CategoryGenreViewSet, CursorPaginationMixin,
+                        ReadReplicaMixin, TitleConditionalMixin)
+from api.pagination import PubDateCursorPagination, TitleCursorPagination
 from api.permissions import (IsAdminOnly, IsAdminOrUserOrReadOnly,
                              IsAdminOrModeratorOrAuthorOnly)
 from api.serializers import (CommentSerializer, ReviewSerializer,
@@ -18,7 +22,9 @@ from api.serializers import (CommentSerializer, ReviewSerializer,
                              TitleGetSerializer,
                              TokenSerializer, UsersSerilizer,
                              UsersSerilizerForAdmin)
-from reviews.models import Review, Title, Category, Genre
+from api.throttling import AuthRateThrottle, PostRateThrottle
+from reviews.csv_files import CSV_FILES, gzip_stream, iter_csv
+from reviews.models import Category, Comment, Genre, Review, Title
 from users.models import User
 from api.filters import TitleFilter
 
@@ -47,20 +53,22 @@ class UsersViewSet(BaseViewSet):
             methods=('GET', 'PATCH'),
             permission_classes=(IsAuthenticated,))
     def me(self, request):
+        user = load_user(request.user)
         if request.method == 'PATCH':
-            serializer = UsersSerilizer(request.user,
+            serializer = UsersSerilizer(user,
                                         data=request.data,
                                         partial=True)
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
-        serializer = UsersSerilizer(request.user)
+        serializer = UsersSerilizer(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class CategoryViewSet(CategoryGenreViewSet):
     """Вьюсет для Категорий."""
 
+    cache_namespace = 'categories'
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
@@ -68,67 +76,141 @@ class CategoryViewSet(CategoryGenreViewSet):
 class GenreViewSet(CategoryGenreViewSet):
     """Вьюсет для Жанров."""
 
+    cache_namespace = 'genres'
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
 
-class TitleViewSet(BaseViewSet):
+class TitleViewSet(ReadReplicaMixin, TitleConditionalMixin,
+                   CursorPaginationMixin, CachedListMixin,
+                   CachedRetrieveMixin, BaseViewSet):
     """Вьюсет для Произведений."""
-    queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')
-    ).all().order_by('-rating')
+    cache_namespace = 'titles'
+    cursor_pagination_class = TitleCursorPagination
+    conditional_actions = ('retrieve',)
+    title_url_kwarg = 'pk'
+    queryset = Title.objects.all()
     serializer_class = TitleSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
     permission_classes = (IsAdminOrUserOrReadOnly,)
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return self.queryset.select_related(
+                'category'
+            ).prefetch_related('genre').order_by('-rating', 'id')
+        if self.action == 'partial_update':
+            # Категория нужна для ответа, жанры сериализатор выставит сам.
+            return self.queryset.select_related('category')
+        return self.queryset
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return TitleGetSerializer
         return TitleSerializer
 
 
-class CommentViewSet(BaseViewSet):
+class CommentViewSet(ReadReplicaMixin, TitleConditionalMixin,
+                     CursorPaginationMixin, BaseViewSet):
     """Вьюсет для Комментариев."""
 
+    cursor_pagination_class = PubDateCursorPagination
     serializer_class = CommentSerializer
     permission_classes = (IsAdminOrModeratorOrAuthorOnly,)
+    throttle_classes = (PostRateThrottle,)
 
     def get_review(self):
-        return get_object_or_404(
-            Review, id=self.kwargs.get('review_id'),
-            title_id=self.kwargs.get('title_id')
-        )
+        """Отзыв из URL, загружается не больше одного раза за запрос."""
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review, id=self.kwargs.get('review_id'),
+                title_id=self.kwargs.get('title_id')
+            )
+        return self._review
 
     def get_queryset(self):
-        return self.get_review().comments.all()
+        if self.action == 'list':
+            # Пустой список и несуществующий отзыв различаются статусом.
+            self.get_review()
+        # Детальные маршруты отдадут 404 по пустой выборке сами.
+        return Comment.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review__title_id=self.kwargs.get('title_id')
+        ).annotate(author_username=F('author__username'))
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, review=self.get_review())
+        serializer.save(
+            author_id=self.request.user.pk, review=self.get_review()
+        )
 
 
-class ReviewViewSet(BaseViewSet):
+class ReviewViewSet(ReadReplicaMixin, TitleConditionalMixin,
+                    CursorPaginationMixin, BaseViewSet):
     """Вьюсет для Отзывов."""
 
+    cursor_pagination_class = PubDateCursorPagination
     serializer_class = ReviewSerializer
     permission_classes = (IsAdminOrModeratorOrAuthorOnly,)
+    throttle_classes = (PostRateThrottle,)
 
     def get_title(self):
-        return get_object_or_404(
-            Title, id=self.kwargs.get('title_id')
-        )
+        """Произведение из URL, загружается не больше одного раза за запрос."""
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title, id=self.kwargs.get('title_id')
+            )
+        return self._title
 
     def get_queryset(self):
-        return self.get_title().reviews.all()
+        if self.action == 'list':
+            self.get_title()
+        return Review.objects.filter(
+            title_id=self.kwargs.get('title_id')
+        ).annotate(author_username=F('author__username'))
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.get_title())
+        # Существование произведения проверяется в транзакции вставки.
+        try:
+            serializer.save(
+                author_id=self.request.user.pk,
+                title_id=self.kwargs.get('title_id')
+            )
+        except Title.DoesNotExist:
+            raise Http404
+
+
+class ExportView(APIView):
+    """Потоковая выгрузка таблицы в CSV в формате import_csv."""
+
+    permission_classes = (IsAuthenticated, IsAdminOnly)
+
+    def get(self, request):
+        name = request.query_params.get('file')
+        if name not in CSV_FILES:
+            return Response(
+                {'file': [f'Допустимые значения: {", ".join(CSV_FILES)}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        lines = iter_csv(name)
+        filename = f'{name}.csv'
+        content_type = 'text/csv; charset=utf-8'
+        if request.query_params.get('compress') == 'gzip':
+            lines = gzip_stream(lines)
+            filename += '.gz'
+            content_type = 'application/gzip'
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
 
 
 class SignUpView(APIView):
     """Вьюсет для регистрации пользователя."""
 
     permission_classes = (AllowAny,)
+    throttle_classes = (AuthRateThrottle,)
 
     def post(self, request):
         """Обработка POST-запроса."""
@@ -142,15 +224,17 @@ class ObtainTokenView(APIView):
     """Вьюсет для получения токена."""
 
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (AuthRateThrottle,)
 
     def post(self, request):
         serializer = TokenSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = get_object_or_404(User,
-                                 username=serializer.data.get('username'))
-        confirmation_code = serializer.data.get('confirmation_code')
-        if default_token_generator.check_token(user, confirmation_code):
-            token = AccessToken.for_user(user)
+        data = serializer.validated_data
+        user = get_object_or_404(User, username=data['username'])
+        if default_token_generator.check_token(
+            user, data['confirmation_code']
+        ):
+            token = RoleAccessToken.for_user(user)
             return Response(
                 {'token': str(token)}, status=status.HTTP_200_OK
             )
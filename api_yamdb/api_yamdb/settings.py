@@ -56,6 +56,19 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'api_yamdb.wsgi.application'
 
+# Профиль SQLite для продакшена (api_yamdb.sqlite_backend): WAL и прагмы
+# на каждое соединение, постоянные соединения и очередь записи процесса.
+SQLITE_PRODUCTION = True
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -63,6 +76,52 @@ DATABASES = {
     }
 }
 
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update({
+        'ENGINE': 'api_yamdb.sqlite_backend',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'serialize_writes': True,
+        },
+    })
+
+# Реплика для чтения: копия основной базы, которую обновляет команда
+# refresh_replica (SQLite online backup API). None - читать из основной.
+READ_REPLICA = 'replica'
+
+# Снимок старше этого числа секунд не используется.
+REPLICA_MAX_LAG = 60
+
+DATABASES[READ_REPLICA] = {
+    **DATABASES['default'],
+    'NAME': BASE_DIR / 'db.replica.sqlite3',
+    # В тестах реплика смотрит на тестовую основную базу.
+    'TEST': {'MIRROR': 'default'},
+}
+
+if SQLITE_PRODUCTION:
+    DATABASES[READ_REPLICA]['OPTIONS'] = {
+        'pragmas': {**SQLITE_PRAGMAS, 'query_only': 1},
+    }
+
+DATABASE_ROUTERS = ['api.replica.ReadReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'filebased': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+# Алиас из CACHES для ответов на анонимные запросы чтения.
+API_RESPONSE_CACHE = 'default'
+
+API_RESPONSE_CACHE_TIMEOUT = 60 * 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -105,14 +164,29 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'api.authentication.ClaimsJWTAuthentication',
+    ),
+    # Скользящие окна api.throttling, счётчики лежат в API_RESPONSE_CACHE:
+    # при нескольких процессах кэш должен быть общим, иначе лимит
+    # умножается на число процессов.
+    'DEFAULT_THROTTLE_RATES': {
+        'auth': '20/minute',
+        'posts': '30/minute',
+    },
+    # Число доверенных прокси перед приложением. При 0 адрес клиента
+    # берётся из REMOTE_ADDR, а X-Forwarded-For не учитывается.
+    'NUM_PROXIES': 0,
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+# Сколько проверенных токенов держать в памяти процесса.
+JWT_DECODED_TOKEN_CACHE_SIZE = 1024
+# Сколько секунд версия токенов пользователя хранится в кэше: не дольше
+# этого отозванный токен действует в процессе, не видевшем отзыва.
+JWT_TOKEN_VERSION_TTL = 30
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -121,3 +195,14 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
 EMAIL_HOST_USER = 'from@example.com'
+
+# Очередь писем (users.outbox): 'thread' - фоновый поток процесса,
+# 'command' - отдельный процесс manage.py send_outbox --loop,
+# 'sync' - отправка сразу после коммита запроса.
+EMAIL_OUTBOX_WORKER = 'thread'
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+# Задержка перед повтором в секундах, удваивается с каждой попыткой.
+EMAIL_OUTBOX_RETRY_DELAY = 30
+# Сколько секунд письмо закреплено за обработчиком, забравшим его.
+EMAIL_OUTBOX_LEASE = 300
@@ -0,0 +1,144 @@
+"""
+SQLite для продакшена.
+
+Поверх стандартного бэкенда: прагмы на каждое новое соединение и очередь
+записи. Запись в SQLite и так идёт по одной, но конкурирующие писатели
+ждут друг друга в цикле занятости и могут получить «database is locked»,
+когда читающая транзакция пытается стать пишущей. Здесь писатели
+процесса выстраиваются в очередь на блокировке, а транзакция сразу
+берёт блокировку записи (BEGIN IMMEDIATE). Между процессами порядок
+по-прежнему обеспечивает busy_timeout.
+"""
+import threading
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+DEFAULT_LOCK_TIMEOUT = 5
+
+# Одна очередь записи на файл базы в пределах процесса.
+writer_locks = {}
+writer_locks_guard = threading.Lock()
+
+
+def get_writer_lock(name):
+    with writer_locks_guard:
+        return writer_locks.setdefault(str(name), threading.Lock())
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """Одиночные записи вне транзакции тоже встают в очередь."""
+
+    def execute(self, query, params=None):
+        if not self.db.needs_writer(query):
+            return super().execute(query, params)
+        with self.db.writer():
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        if not self.db.needs_writer(query):
+            return super().executemany(query, param_list)
+        with self.db.writer():
+            return super().executemany(query, param_list)
+
+
+class WriterLock:
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.acquire_writer()
+
+    def __exit__(self, *exc_info):
+        self.db.release_writer()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Бэкенд SQLite с прагмами соединения и очередью записи.
+
+    Параметры в OPTIONS: pragmas - словарь прагм, выполняемых при
+    открытии соединения; serialize_writes - включает очередь записи.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = options.get('pragmas', {})
+        self.serialize_writes = options.get('serialize_writes', False)
+        self.writer_lock = get_writer_lock(self.settings_dict['NAME'])
+        self.holds_writer = False
+
+    @property
+    def lock_timeout(self):
+        busy_timeout = self.pragmas.get('busy_timeout')
+        if busy_timeout is None:
+            return DEFAULT_LOCK_TIMEOUT
+        return int(busy_timeout) / 1000
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('serialize_writes', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.db = self
+        return cursor
+
+    def needs_writer(self, query):
+        return (
+            self.serialize_writes
+            and not self.holds_writer
+            and query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        )
+
+    def acquire_writer(self):
+        if not self.writer_lock.acquire(timeout=self.lock_timeout):
+            raise OperationalError('database is locked')
+        self.holds_writer = True
+
+    def release_writer(self):
+        if self.holds_writer:
+            self.holds_writer = False
+            self.writer_lock.release()
+
+    def writer(self):
+        return WriterLock(self)
+
+    def _start_transaction_under_autocommit(self):
+        if not self.serialize_writes:
+            return super()._start_transaction_under_autocommit()
+        self.acquire_writer()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self.release_writer()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_writer()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_writer()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_writer()
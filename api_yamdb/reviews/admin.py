@@ -21,6 +21,7 @@ class ReviewAdmin(admin.ModelAdmin):
         'pub_date',
         'author',
     )
+    list_select_related = ('title', 'author')
     empty_value_display = '-пусто-'
 
 
@@ -42,6 +43,7 @@ class CommentAdmin(admin.ModelAdmin):
         'review',
         'author',
     )
+    list_select_related = ('review', 'author')
     empty_value_display = '-пусто-'
 
 
@@ -62,8 +64,12 @@ class TitleAdmin(admin.ModelAdmin):
         'genre',
         'category'
     )
+    list_select_related = ('category',)
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('genre')
+
     @admin.display(description='Жанр')
     def display_genre(self, obj):
         return ', '.join([genre.name for genre in obj.genre.all()])
@@ -0,0 +1,90 @@
+"""
+Формат CSV-выгрузки базы: общий для import_csv, export_csv и /api/v1/export/.
+"""
+import csv
+import zlib
+
+from reviews.models import Review, Comment, Category, Title, Genre
+from users.models import User
+
+EXPORT_CHUNK_SIZE = 2000
+
+GenreTitle = Title.genre.through
+
+
+# Имя файла: (модель, название, столбцы CSV и соответствующие им поля).
+CSV_FILES = {
+    'category': (Category, 'Category', (
+        ('id', 'id'), ('name', 'name'), ('slug', 'slug'),
+    )),
+    'genre': (Genre, 'Genre', (
+        ('id', 'id'), ('name', 'name'), ('slug', 'slug'),
+    )),
+    'users': (User, 'User', (
+        ('id', 'id'), ('username', 'username'), ('email', 'email'),
+        ('role', 'role'), ('bio', 'bio'), ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+    )),
+    'titles': (Title, 'Title', (
+        ('id', 'id'), ('name', 'name'), ('year', 'year'),
+        ('category', 'category_id'),
+    )),
+    'genre_title': (GenreTitle, 'GenreTitle', (
+        ('id', 'id'), ('title_id', 'title_id'), ('genre_id', 'genre_id'),
+    )),
+    'review': (Review, 'Review', (
+        ('id', 'id'), ('title_id', 'title_id'), ('text', 'text'),
+        ('author', 'author_id'), ('score', 'score'),
+        ('pub_date', 'pub_date'),
+    )),
+    'comments': (Comment, 'Comment', (
+        ('id', 'id'), ('review_id', 'review_id'), ('text', 'text'),
+        ('author', 'author_id'), ('pub_date', 'pub_date'),
+    )),
+}
+
+# Этапы по графу зависимостей: файлы одного этапа друг от друга
+# не зависят и могут разбираться одновременно.
+STAGES = (
+    ('category', 'genre', 'users'),
+    ('titles',),
+    ('genre_title', 'review'),
+    ('comments',),
+)
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(name, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки CSV-файла name, начиная с заголовка. Таблица читается курсором
+    пачками по chunk_size, поэтому память не зависит от её размера.
+    """
+    model, _, columns = CSV_FILES[name]
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, _ in columns])
+    rows = model.objects.order_by('pk').values_list(
+        *(attname for _, attname in columns)
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow([
+            '' if value is None
+            else value.isoformat() if hasattr(value, 'isoformat')
+            else value
+            for value in row
+        ])
+
+
+def gzip_stream(chunks):
+    """Потоковое сжатие gzip текстовых фрагментов."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,32 @@
+"""
+Объекты, которые сейчас удаляются вместе с зависимыми: обновлять их
+счётчики на каждый каскадно удалённый отзыв или комментарий незачем.
+
+Отметки ставит сигнал pre_delete, но только внутри deletion_scope() -
+вызова delete() у произведения или отзыва. По выходу из него отметки
+снимаются, даже если каскад оборвался ошибкой посередине.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# None - удаление идёт вне deletion_scope(), отметки не ставятся.
+deleting = ContextVar('deleting', default=None)
+
+
+def is_deleting(model, pk):
+    return (model, pk) in (deleting.get() or ())
+
+
+def mark_deleting(model, pk):
+    marks = deleting.get()
+    if marks is not None:
+        deleting.set(marks | {(model, pk)})
+
+
+@contextmanager
+def deletion_scope():
+    token = deleting.set(deleting.get() or frozenset())
+    try:
+        yield
+    finally:
+        deleting.reset(token)
@@ -0,0 +1,83 @@
+"""
+Полнотекстовый индекс произведений (SQLite FTS5).
+
+Индекс хранит только токены, текст читается из reviews_title, а
+синхронизацию выполняют триггеры. На SQLite Django пересоздаёт таблицу
+при изменении её схемы, и триггеры теряются, поэтому каждая миграция,
+меняющая Title, должна заканчиваться операцией restore_triggers().
+"""
+from django.db import migrations
+
+TITLE_FTS_TABLE = 'reviews_title_fts'
+
+CREATE_TABLE = (
+    f"""
+    CREATE VIRTUAL TABLE {TITLE_FTS_TABLE} USING fts5(
+        name, description,
+        content='reviews_title', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+)
+
+CREATE_TRIGGERS = (
+    f"""
+    CREATE TRIGGER {TITLE_FTS_TABLE}_ai AFTER INSERT ON reviews_title BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {TITLE_FTS_TABLE}_ad AFTER DELETE ON reviews_title BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(
+            {TITLE_FTS_TABLE}, rowid, name, description
+        )
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {TITLE_FTS_TABLE}_au
+    AFTER UPDATE OF name, description ON reviews_title BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(
+            {TITLE_FTS_TABLE}, rowid, name, description
+        )
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+)
+
+REBUILD = (
+    f"INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}) VALUES ('rebuild')",
+)
+
+DROP_TRIGGERS = tuple(
+    f'DROP TRIGGER IF EXISTS {TITLE_FTS_TABLE}_{suffix}'
+    for suffix in ('au', 'ad', 'ai')
+)
+
+DROP_TABLE = (f'DROP TABLE IF EXISTS {TITLE_FTS_TABLE}',)
+
+
+def run_on_sqlite(*statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+def create_index():
+    return migrations.RunPython(
+        run_on_sqlite(*CREATE_TABLE, *CREATE_TRIGGERS, *REBUILD),
+        run_on_sqlite(*DROP_TRIGGERS, *DROP_TABLE),
+    )
+
+
+def restore_triggers():
+    return migrations.RunPython(
+        run_on_sqlite(*DROP_TRIGGERS, *CREATE_TRIGGERS, *REBUILD),
+        run_on_sqlite(*DROP_TRIGGERS, *CREATE_TRIGGERS, *REBUILD),
+    )
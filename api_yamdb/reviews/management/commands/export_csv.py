@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+
+from reviews.csv_files import (CSV_FILES, EXPORT_CHUNK_SIZE, gzip_stream,
+                               iter_csv)
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка базы в CSV-файлы в формате import_csv'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=os.path.join(settings.BASE_DIR, 'export'),
+            help='Каталог для CSV-файлов.'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать файлы в .csv.gz.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        os.makedirs(options['dir'], exist_ok=True)
+        for name, (_, label, _) in CSV_FILES.items():
+            started = time.monotonic()
+            lines = iter_csv(name, options['chunk_size'])
+            if options['gzip']:
+                path = os.path.join(options['dir'], f'{name}.csv.gz')
+                with open(path, 'wb') as file:
+                    file.writelines(gzip_stream(lines))
+            else:
+                path = os.path.join(options['dir'], f'{name}.csv')
+                with open(path, 'w', encoding='utf-8', newline='') as file:
+                    file.writelines(lines)
+            self.stdout.write(self.style.SUCCESS(
+                f'{label} выгружен в {path} '
+                f'за {time.monotonic() - started:.2f} с'
+            ))
@@ -1,114 +1,555 @@
-import os
 import csv
+import gzip
+import io
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import groupby, islice
 
-from django.core.management.base import BaseCommand
+import django
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from api.cache import bump_versions
+from reviews.csv_files import CSV_FILES, STAGES, GenreTitle
+from reviews.models import Review, Comment, Title
+from users.models import TOKEN_CLAIM_FIELDS, User
+
+BATCH_SIZE = 1000
+PROGRESS_EVERY = 100_000
+# Ограничение на число параметров в одном IN (...) для SQLite.
+LOOKUP_SIZE = 500
+# Файл: модель с денормализованным счётчиком, ссылка на неё и поля строки,
+# от которых счётчик зависит.
+COUNTED = {
+    'review': (Title, 'title_id', ('title_id', 'score')),
+    'comments': (Review, 'review_id', ('review_id',)),
+}
+# Файл: поля строки, встроенные в ответы произведений (None - все поля),
+# и условия, по которым находятся произведения изменённых строк. Версия
+# таких произведений растёт, чтобы сменился их ETag.
+EMBEDDED = {
+    'titles': (None, ('pk__in',)),
+    'category': (None, ('category__in',)),
+    'genre': (None, ('genre__in',)),
+    'users': (('username',), (
+        'reviews__author__in', 'reviews__comments__author__in',
+    )),
+}
+
+
+@contextmanager
+def keep_pub_date(*models):
+    """
+    bulk_create заполняет поля auto_now_add текущим временем,
+    а даты публикации нужно взять из CSV.
+    """
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def open_csv(path):
+    """
+    Открывает CSV как текстовый поток. Если файла нет, ищется его сжатая
+    версия .gz или .zst; распаковка идёт потоково, без чтения в память.
+    """
+    for candidate in (path, f'{path}.gz', f'{path}.zst'):
+        if os.path.exists(candidate):
+            break
+    else:
+        raise CommandError(f'Файл {path} не найден.')
+    if candidate.endswith('.gz'):
+        return gzip.open(candidate, 'rt', encoding='utf-8', newline='')
+    if candidate.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError(
+                f'Для чтения {candidate} установите пакет zstandard.'
+            )
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(
+                open(candidate, 'rb'), closefd=True
+            ),
+            encoding='utf-8',
+            newline=''
+        )
+    return open(candidate, 'r', encoding='utf-8', newline='')
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def read_chunks(name, path, size, skip=0):
+    """Строки файла пачками, начиная с первой незагруженной."""
+    with open_csv(path) as csv_file:
+        rows = islice(csv.DictReader(csv_file), skip, None)
+        for chunk in batches(rows, size):
+            yield name, chunk
+
+
+def build_chunk(name, rows):
+    """
+    Собирает объекты пачки и приводит значения к типам полей. Выполняется
+    в процессах пула, поэтому не обращается к базе: ссылки проверит база
+    при записи.
+    """
+    model, label, columns = CSV_FILES[name]
+    fields = model._meta.concrete_fields
+    objects = []
+    for row in rows:
+        obj = model(**{
+            attname: row[column] for column, attname in columns
+        })
+        try:
+            for field in fields:
+                value = getattr(obj, field.attname)
+                if value is not None:
+                    setattr(obj, field.attname, field.to_python(value))
+        except ValidationError as error:
+            raise CommandError(
+                f'{label}, id={row.get("id")}, {field.name}: '
+                f'{"; ".join(error.messages)}'
+            )
+        objects.append(obj)
+    return name, objects
+
+
+def ordered_results(executor, chunks, window):
+    """Результаты пула в исходном порядке, не более window пачек в работе."""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(build_chunk, *chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Checkpoint:
+    """
+    Файл с ходом импорта: загруженные файлы и число зафиксированных строк
+    в текущем. Перезаписывается атомарно после каждой фиксации.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.resumed = bool(path) and os.path.exists(path)
+        self.state = {'done': [], 'rows': {}}
+        if self.resumed:
+            with open(path, encoding='utf-8') as file:
+                self.state = json.load(file)
+
+    def is_done(self, name):
+        return name in self.state['done']
+
+    def rows(self, name):
+        return self.state['rows'].get(name, 0)
 
-from reviews.models import Review, Comment, Category, Title, Genre
-from users.models import User
+    def save(self, name, rows, done=False):
+        if not self.path:
+            return
+        self.state['rows'][name] = rows
+        if done:
+            self.state['done'].append(name)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SeenIds:
+    """
+    id строк источника для --delete-missing. Хранятся во временных
+    таблицах базы, а не в памяти процесса.
+    """
+
+    def __init__(self, names):
+        self.tables = {name: f'import_seen_{name}' for name in names}
+        with connection.cursor() as cursor:
+            for table in self.tables.values():
+                cursor.execute(
+                    f'CREATE TEMP TABLE {table} (id INTEGER PRIMARY KEY)'
+                )
+
+    def add(self, name, objects):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.tables[name]} (id) VALUES (%s)',
+                [(obj.pk,) for obj in objects]
+            )
+
+    def query(self, name):
+        return RawSQL(f'SELECT id FROM {self.tables[name]}', ())
+
+    def drop(self):
+        with connection.cursor() as cursor:
+            for table in self.tables.values():
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def upsert(model, objects, fields):
+    """
+    Добавляет новые строки и обновляет изменившиеся. Строки сравниваются
+    с базой по первичному ключу и содержимому сравниваемых полей.
+    Возвращает новые и изменённые объекты и прежние значения полей
+    изменённых строк по их id.
+    """
+    existing = {}
+    for batch in batches(objects, LOOKUP_SIZE):
+        existing.update(
+            (pk, values) for pk, *values in model.objects.filter(
+                pk__in=[obj.pk for obj in batch]
+            ).values_list('pk', *fields)
+        )
+    new, changed = [], []
+    for obj in objects:
+        values = existing.get(obj.pk)
+        if values is None:
+            new.append(obj)
+        elif values != [getattr(obj, field) for field in fields]:
+            changed.append(obj)
+    model.objects.bulk_create(new)
+    model.objects.bulk_update(changed, fields)
+    return new, changed, {
+        obj.pk: dict(zip(fields, existing[obj.pk])) for obj in changed
+    }
+
+
+def revoke_tokens(users, previous):
+    """
+    bulk_update не отправляет pre_save, поэтому версия токенов
+    пользователей, у которых изменились утверждения токена, растёт здесь.
+    """
+    ids = [
+        user.pk for user in users
+        if any(
+            previous[user.pk][field] != getattr(user, field)
+            for field in TOKEN_CLAIM_FIELDS if field in previous[user.pk]
+        )
+    ]
+    if ids:
+        User.objects.filter(pk__in=ids).update(
+            token_version=F('token_version') + 1
+        )
 
 
 class Command(BaseCommand):
     help = 'Импорт CSV-файлов в базу данных'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=os.path.join(settings.BASE_DIR, 'static/data'),
+            help='Каталог с CSV-файлами.'
+        )
+        parser.add_argument(
+            '--file',
+            action='append',
+            default=[],
+            metavar='ИМЯ=ПУТЬ',
+            help=(
+                'Путь к отдельному файлу вместо файла из --dir, например '
+                'review=/data/review.csv.gz. Имена: '
+                + ', '.join(CSV_FILES) + '.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одном INSERT.'
+        )
+        parser.add_argument(
+            '--progress-every',
+            type=int,
+            default=PROGRESS_EVERY,
+            help='Как часто (в строках) сообщать о ходе импорта.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help=(
+                'Число процессов для разбора и проверки строк. '
+                'Запись всегда идёт из одного процесса.'
+            )
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help=(
+                'Файл с ходом импорта. Если он есть, импорт продолжается с '
+                'места остановки; строки фиксируются пачками.'
+            )
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help=(
+                'Добавлять новые и обновлять изменившиеся строки вместо '
+                'простой вставки. Повторный запуск ничего не меняет.'
+            )
+        )
+        parser.add_argument(
+            '--delete-missing',
+            action='store_true',
+            help='Вместе с --upsert: удалить строки, которых нет в файлах.'
+        )
+
     def handle(self, *args, **options):
-        csv_dir = os.path.join(settings.BASE_DIR, 'static/data')
-
-        # Загрузка данных для Category
-        category_file_path = os.path.join(csv_dir, 'category.csv')
-        with open(category_file_path, 'r', encoding='utf-8') as category_file:
-            csv_reader = csv.DictReader(category_file)
-            for row in csv_reader:
-                Category.objects.create(name=row['name'], slug=row['slug'])
-
-        self.stdout.write(self.style.SUCCESS('Category успешно импортирован!'))
-
-        # Загрузка данных для Genre
-        genre_file_path = os.path.join(csv_dir, 'genre.csv')
-        with open(genre_file_path, 'r', encoding='utf-8') as genre_file:
-            csv_reader = csv.DictReader(genre_file)
-            for row in csv_reader:
-                Genre.objects.create(name=row['name'], slug=row['slug'])
-
-        self.stdout.write(self.style.SUCCESS('Genre успешно импортирован!'))
-
-        # Загрузка данных для Title
-        title_file_path = os.path.join(csv_dir, 'titles.csv')
-        with open(title_file_path, 'r', encoding='utf-8') as title_file:
-            csv_reader = csv.DictReader(title_file)
-            for row in csv_reader:
-                category = Category.objects.get(id=row['category'])
-                title = Title.objects.create(
-                    name=row['name'],
-                    year=row['year'],
-                    category=category
-                )
+        self.batch_size = options['batch_size']
+        self.progress_every = options['progress_every']
+        if min(self.batch_size, self.progress_every, options['workers']) < 1:
+            raise CommandError(
+                '--batch-size, --progress-every и --workers должны быть '
+                'больше нуля.'
+            )
+        self.check_modes(options)
+        self.workers = options['workers']
+        self.upsert = options['upsert']
+        self.stats = Counter()
+        # id объектов, чьи счётчики задела загрузка в режиме --upsert.
+        self.affected = defaultdict(set)
+        # id изменённых строк из EMBEDDED и произведения с изменёнными
+        # связями с жанрами: их версию нужно поднять.
+        self.embedded = defaultdict(set)
+        self.relinked = set()
+        self.paths = self.get_paths(options['dir'], options['file'])
+        self.checkpoint = Checkpoint(options['checkpoint'])
+        if self.checkpoint.resumed:
+            self.stdout.write(f'Продолжаем импорт из {self.checkpoint.path}')
+        total_rows, started = 0, time.monotonic()
+        with self.get_executor() as executor, (
+                keep_pub_date(Review, Comment)):
+            self.seen = SeenIds(CSV_FILES) if options['delete_missing'] else (
+                None)
+            try:
+                for stage in STAGES:
+                    total_rows += self.import_stage(stage, executor)
+                if self.seen:
+                    self.delete_missing()
+            finally:
+                if self.seen:
+                    self.seen.drop()
+        self.refresh_counters()
+        if total_rows if not self.upsert else sum(self.stats.values()):
+            # Ответы API, собранные до импорта, больше не нужны.
+            bump_versions('titles', 'categories:list', 'genres:list')
+        self.checkpoint.remove()
+        self.report('Всего', total_rows, time.monotonic() - started)
+
+    def refresh_counters(self):
+        """
+        Массовые операции не отправляют сигналы, поэтому счётчики
+        пересчитываются один раз после загрузки. При --upsert - только
+        для задетых строк: повторный запуск без изменений ничего не трогает.
+        Удаления --delete-missing идут через ORM, их учитывают сигналы.
+        Пересчёт рейтинга заодно поднимает версию произведения.
+        """
+        if not self.upsert or self.checkpoint.resumed:
+            # При продолжении импорта задетые до остановки строки неизвестны.
+            Title.objects.refresh_rating()
+            Review.objects.refresh_comment_count()
+            return
+        for batch in batches(sorted(self.affected[Title]), LOOKUP_SIZE):
+            Title.objects.filter(pk__in=batch).refresh_rating()
+        for batch in batches(sorted(self.affected[Review]), LOOKUP_SIZE):
+            Review.objects.filter(pk__in=batch).refresh_comment_count()
+        titles = self.embedding_titles() - self.affected[Title]
+        for batch in batches(sorted(titles), LOOKUP_SIZE):
+            Title.objects.filter(pk__in=batch).touch()
+
+    def embedding_titles(self):
+        """Произведения, в ответы которых встроены изменённые строки."""
+        titles = set(self.relinked)
+        for name, ids in self.embedded.items():
+            for lookup in EMBEDDED[name][1]:
+                for batch in batches(sorted(ids), LOOKUP_SIZE):
+                    titles.update(Title.objects.filter(
+                        **{lookup: batch}
+                    ).values_list('pk', flat=True))
+        return titles
 
-        self.stdout.write(self.style.SUCCESS('Title успешно импортирован!'))
+    def check_modes(self, options):
+        if options['delete_missing'] and not options['upsert']:
+            raise CommandError('--delete-missing работает только с --upsert.')
+        if options['delete_missing'] and options['checkpoint']:
+            # Список строк источника не переживает перезапуск.
+            raise CommandError(
+                '--delete-missing нельзя сочетать с --checkpoint.'
+            )
 
-        # Обработка связей между Genre и Title
-        genre_title_file_path = os.path.join(csv_dir, 'genre_title.csv')
-        with open(genre_title_file_path, 'r', encoding='utf-8') as (
-                genre_title_file):
-            csv_reader = csv.DictReader(genre_title_file)
-            for row in csv_reader:
-                title_id = row['title_id']
-                genre_id = row['genre_id']
+    def get_paths(self, csv_dir, overrides):
+        paths = {
+            name: os.path.join(csv_dir, f'{name}.csv') for name in CSV_FILES
+        }
+        for override in overrides:
+            name, sep, path = override.partition('=')
+            if not sep or name not in paths:
+                raise CommandError(f'Некорректное значение --file: {override}')
+            paths[name] = path
+        return paths
 
-                title = Title.objects.get(id=title_id)
-                genre = Genre.objects.get(id=genre_id)
+    def get_executor(self):
+        if self.workers == 1:
+            return nullcontext()
+        # Дочерним процессам соединения с базой не нужны.
+        connections.close_all()
+        return ProcessPoolExecutor(self.workers, initializer=django.setup)
 
-                title.genre.add(genre)
+    def import_stage(self, stage, executor):
+        names = [name for name in stage if not self.checkpoint.is_done(name)]
+        chunks = (
+            chunk
+            for name in names
+            for chunk in read_chunks(
+                name, self.paths[name], self.batch_size,
+                skip=self.checkpoint.rows(name)
+            )
+        )
+        if executor is None:
+            results = (build_chunk(*chunk) for chunk in chunks)
+        else:
+            results = ordered_results(
+                executor, chunks, window=self.workers * 2
+            )
+        rows = 0
+        loaded = set()
+        for name, group in groupby(results, key=lambda result: result[0]):
+            rows += self.import_file(name, (objs for _, objs in group))
+            loaded.add(name)
+        # Пустые файлы не дают ни одной пачки.
+        for name in names:
+            if name not in loaded:
+                rows += self.import_file(name, ())
+        return rows
 
+    def import_file(self, name, chunks):
+        model, label, _ = CSV_FILES[name]
+        started = time.monotonic()
+        rows = self.checkpoint.rows(name)
+        report_at = rows + self.progress_every
+        # С контрольной точкой фиксируем каждую пачку, иначе весь файл
+        # загружается одной транзакцией.
+        checkpointed = bool(self.checkpoint.path)
+        ignore_conflicts = self.checkpoint.resumed
+        try:
+            with nullcontext() if checkpointed else transaction.atomic():
+                for objects in chunks:
+                    with transaction.atomic() if checkpointed else (
+                            nullcontext()):
+                        self.write_batch(name, objects, ignore_conflicts)
+                    ignore_conflicts = False
+                    rows += len(objects)
+                    self.checkpoint.save(name, rows)
+                    if rows >= report_at:
+                        self.report(label, rows, time.monotonic() - started)
+                        report_at = rows + self.progress_every
+        except IntegrityError as error:
+            # Ссылки проверяются базой при фиксации транзакции.
+            raise CommandError(f'{label}: {error}')
+        self.checkpoint.save(name, rows, done=True)
         self.stdout.write(self.style.SUCCESS(
-            'GenreTitle успешно импортирован!'))
-
-        # Загрузка данных для User
-        user_file_path = os.path.join(csv_dir, 'users.csv')
-        with open(user_file_path, 'r', encoding='utf-8') as user_file:
-            csv_reader = csv.DictReader(user_file)
-            for row in csv_reader:
-                User.objects.create(
-                    id=row['id'],
-                    username=row['username'],
-                    email=row['email'],
-                    role=row['role'],
-                    bio=row['bio'],
-                    first_name=row['first_name'],
-                    last_name=row['last_name']
-                )
+            f'{label} успешно импортирован!'
+        ))
+        self.report(label, rows, time.monotonic() - started)
+        if self.upsert:
+            self.stdout.write(
+                f'{label}: добавлено {self.stats[name, "new"]}, '
+                f'изменено {self.stats[name, "changed"]}'
+            )
+        return rows
 
-        self.stdout.write(self.style.SUCCESS('User успешно импортирован!'))
-
-        # Загрузка данных для Review
-        review_file_path = os.path.join(csv_dir, 'review.csv')
-        with open(review_file_path, 'r', encoding='utf-8') as review_file:
-            csv_reader = csv.DictReader(review_file)
-            for row in csv_reader:
-                title = Title.objects.get(id=row['title_id'])
-                author = User.objects.get(id=row['author'])
-                Review.objects.create(
-                    title=title,
-                    text=row['text'],
-                    author=author,
-                    score=row['score'],
-                    pub_date=row['pub_date']
-                )
+    def write_batch(self, name, objects, ignore_conflicts):
+        model, _, columns = CSV_FILES[name]
+        if self.seen:
+            self.seen.add(name, objects)
+        if not self.upsert:
+            # Пачка могла быть зафиксирована перед остановкой,
+            # но не попасть в контрольную точку.
+            model.objects.bulk_create(
+                objects, ignore_conflicts=ignore_conflicts
+            )
+            return
+        new, changed, previous = upsert(
+            model, objects,
+            [attname for _, attname in columns if attname != 'id']
+        )
+        self.stats[name, 'new'] += len(new)
+        self.stats[name, 'changed'] += len(changed)
+        if name in COUNTED:
+            self.collect_affected(name, new, changed, previous)
+        if name in EMBEDDED:
+            self.collect_embedded(name, changed, previous)
+        if model is GenreTitle:
+            # Связь могла перейти к другому произведению: поднять оба.
+            self.relinked.update(obj.title_id for obj in new + changed)
+            self.relinked.update(
+                previous[obj.pk]['title_id'] for obj in changed
+            )
+        if model is User:
+            revoke_tokens(changed, previous)
 
-        self.stdout.write(self.style.SUCCESS('Review успешно импортирован!'))
-
-        # Загрузка данных для Comment
-        comment_file_path = os.path.join(csv_dir, 'comments.csv')
-        with open(comment_file_path, 'r', encoding='utf-8') as comment_file:
-            csv_reader = csv.DictReader(comment_file)
-            for row in csv_reader:
-                review = Review.objects.get(id=row['review_id'])
-                author = User.objects.get(id=row['author'])
-                Comment.objects.create(
-                    review=review,
-                    text=row['text'],
-                    author=author,
-                    pub_date=row['pub_date']
-                )
+    def collect_embedded(self, name, changed, previous):
+        # Новые строки ещё не встроены в ответы, которые могли закэшировать.
+        fields, _ = EMBEDDED[name]
+        self.embedded[name].update(
+            obj.pk for obj in changed
+            if fields is None or any(
+                previous[obj.pk][field] != getattr(obj, field)
+                for field in fields
+            )
+        )
+
+    def collect_affected(self, name, new, changed, previous):
+        parent, attname, fields = COUNTED[name]
+        affected = self.affected[parent]
+        affected.update(getattr(obj, attname) for obj in new)
+        for obj in changed:
+            old = previous[obj.pk]
+            if any(old[field] != getattr(obj, field) for field in fields):
+                # Строка могла перейти к другому родителю: пересчитать оба.
+                affected.update((old[attname], getattr(obj, attname)))
+
+    def delete_missing(self):
+        # Сначала зависимые таблицы, чтобы каскады не делали лишней работы.
+        for stage in reversed(STAGES):
+            for name in reversed(stage):
+                model, label, _ = CSV_FILES[name]
+                missing = model.objects.exclude(pk__in=self.seen.query(name))
+                if model is GenreTitle:
+                    # Удаление связей напрямую не отправляет m2m_changed.
+                    self.relinked.update(
+                        missing.values_list('title_id', flat=True)
+                    )
+                with transaction.atomic():
+                    deleted, _ = missing.delete()
+                self.stats[name, 'deleted'] += deleted
+                self.stdout.write(f'{label}: удалено {deleted}')
 
-        self.stdout.write(self.style.SUCCESS('Comment успешно импортирован!'))
+    def report(self, label, rows, elapsed):
+        rate = rows / elapsed if elapsed else rows
+        self.stdout.write(
+            f'{label}: {rows} строк за {elapsed:.2f} с '
+            f'({rate:.0f} строк/с)'
+        )
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from reviews.fts import create_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_title_rating'),
+    ]
+
+    operations = [
+        create_index(),
+    ]
@@ -1,7 +1,14 @@
+import re
+
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import (Avg, Count, F, FloatField, OuterRef, Q,
+                              Subquery, Sum)
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
 
+from .deleting import deletion_scope
+from .fts import TITLE_FTS_TABLE
 from .validators import validate_year
 
 User = get_user_model()
@@ -9,6 +16,7 @@ User = get_user_model()
 MAX_LENGTH = 256
 TEXT_LIMIT_SHOW = 20
 SLUG_LIMIT = 50
+SEARCH_WORD = re.compile(r'\w+')
 
 
 class CategoryGenreModel(models.Model):
@@ -64,6 +72,90 @@ class Genre(CategoryGenreModel):
         verbose_name_plural = 'Жанры'
 
 
+class TitleQuerySet(models.QuerySet):
+    """Запросы произведений с поддержкой денормализованного рейтинга."""
+
+    def delete(self):
+        with deletion_scope():
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def touch(self, **fields):
+        """Увеличивает версию произведений для условных GET-запросов."""
+        return self.update(
+            version=F('version') + 1,
+            modified=Now(),
+            **fields
+        )
+
+    def shift_rating(self, score_delta, count_delta=0):
+        """
+        Сдвигает сумму оценок и число отзывов одним UPDATE без
+        повторного чтения отзывов. Рейтинг пересчитывается из старых
+        значений столбцов в том же выражении.
+        """
+        score_sum = F('score_sum') + score_delta
+        review_count = F('review_count') + count_delta
+        return self.touch(
+            score_sum=score_sum,
+            review_count=review_count,
+            rating=(
+                Cast(score_sum, FloatField())
+                / NullIf(review_count, 0)
+            ),
+        )
+
+    def refresh_rating(self):
+        """Полностью пересчитывает рейтинг по таблице отзывов."""
+        reviews = Review.objects.filter(
+            title=OuterRef('pk')
+        ).order_by().values('title')
+        return self.touch(
+            score_sum=Coalesce(
+                Subquery(reviews.annotate(total=Sum('score')).values('total')),
+                0
+            ),
+            review_count=Coalesce(
+                Subquery(reviews.annotate(total=Count('pk')).values('total')),
+                0
+            ),
+            rating=Subquery(
+                reviews.annotate(total=Avg('score')).values('total')
+            ),
+        )
+
+    def search(self, text):
+        """
+        Полнотекстовый поиск по названию и описанию через индекс FTS5,
+        упорядоченный по релевантности. Последнее слово ищется по префиксу,
+        чтобы поиск подходил для подсказок при наборе.
+        """
+        words = SEARCH_WORD.findall(text)
+        if not words:
+            return self.none()
+        if connections[self.db].vendor != 'sqlite':
+            query = Q()
+            for word in words:
+                query &= (
+                    Q(name__icontains=word) | Q(description__icontains=word)
+                )
+            return self.filter(query)
+        match = ' '.join(f'"{word}"' for word in words) + '*'
+        table = self.model._meta.db_table
+        return self.extra(
+            tables=(TITLE_FTS_TABLE,),
+            where=(
+                f'{TITLE_FTS_TABLE}.rowid = {table}.id',
+                f'{TITLE_FTS_TABLE} MATCH %s',
+            ),
+            params=(match,),
+            select={'search_rank': f'bm25({TITLE_FTS_TABLE}, 10.0, 1.0)'},
+            order_by=('search_rank', 'id'),
+        )
+
+
 class Title(models.Model):
     """Модель произведения."""
 
@@ -89,15 +181,77 @@ class Title(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Категория'
     )
+    rating = models.FloatField(
+        verbose_name='Рейтинг',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    score_sum = models.PositiveIntegerField(
+        verbose_name='Сумма оценок',
+        default=0,
+        editable=False,
+    )
+    review_count = models.PositiveIntegerField(
+        verbose_name='Количество отзывов',
+        default=0,
+        editable=False,
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=0,
+        editable=False,
+    )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Произведение'
         verbose_name_plural = 'Произведения'
+        indexes = (
+            models.Index(
+                fields=('-rating', 'id'),
+                name='title_rating_idx'
+            ),
+        )
+
+    def delete(self, *args, **kwargs):
+        # Каскад не пересчитывает рейтинг на каждый удаляемый отзыв.
+        with deletion_scope():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
+class ReviewQuerySet(models.QuerySet):
+    """Запросы отзывов с поддержкой денормализованного числа комментариев."""
+
+    def delete(self):
+        with deletion_scope():
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def shift_comment_count(self, delta):
+        return self.update(comment_count=F('comment_count') + delta)
+
+    def refresh_comment_count(self):
+        """Полностью пересчитывает число комментариев по таблице."""
+        comments = Comment.objects.filter(
+            review=OuterRef('pk')
+        ).order_by().values('review')
+        return self.update(comment_count=Coalesce(
+            Subquery(comments.annotate(total=Count('pk')).values('total')),
+            0
+        ))
+
+
 class Review(CommentReviewModel):
     """Модель Отзывов."""
 
@@ -114,6 +268,13 @@ class Review(CommentReviewModel):
         ),
         error_messages={'validators': 'Диапазон от 1 до 10!'}
     )
+    comment_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = ReviewQuerySet.as_manager()
 
     class Meta:
         default_related_name = 'reviews'
@@ -125,6 +286,32 @@ class Review(CommentReviewModel):
                 fields=('title', 'author', ),
                 name='unique review'
             )]
+        indexes = [
+            models.Index(
+                fields=('title', 'pub_date'), name='review_title_date_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Рейтинг произведения обновляется сигналом post_save,
+        # поэтому запись отзыва и пересчёт идут одной транзакцией.
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            if not self._state.adding:
+                # Разница оценок считается от сохранённой оценки, прочитанной
+                # в транзакции записи: копия могла устареть, пока её
+                # правили одновременно с другой.
+                self._saved_score = Review._base_manager.using(using).filter(
+                    pk=self.pk
+                ).values_list('score', flat=True).first()
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Каскад не пересчитывает счётчик на каждый удаляемый комментарий.
+        with deletion_scope():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return (
@@ -164,6 +351,16 @@ class Comment(CommentReviewModel):
         ordering = ('-pub_date', 'author', )
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=('review', 'pub_date'), name='comment_review_date_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Счётчик комментариев отзыва обновляется сигналом post_save.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return (
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+
+from .deleting import is_deleting, mark_deleting
+from .models import Category, Comment, Genre, Review, Title
+
+User = get_user_model()
+
+
+@receiver(pre_delete, sender=Title)
+@receiver(pre_delete, sender=Review)
+def mark_deleted_parent(sender, instance, **kwargs):
+    """Отмечает объект, удаляемый вместе с зависимыми."""
+    mark_deleting(sender, instance.pk)
+
+
+@receiver(post_init, sender=Review)
+def remember_review_score(sender, instance, **kwargs):
+    """Запоминает исходную оценку, чтобы считать только разницу."""
+    instance._saved_score = instance.__dict__.get('score')
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    """Сдвигает рейтинг произведения при создании и изменении отзыва."""
+    titles = Title.objects.filter(pk=instance.title_id)
+    if created:
+        # Обновление рейтинга заодно проверяет, что произведение существует:
+        # исключение откатывает транзакцию Review.save вместе со вставкой.
+        if not titles.shift_rating(instance.score, 1):
+            raise Title.DoesNotExist(
+                f'Произведение {instance.title_id} не найдено.'
+            )
+    elif instance._saved_score is None:
+        # Исходная оценка неизвестна (отложенное поле или объект собран
+        # вручную) - пересчитываем рейтинг целиком.
+        titles.refresh_rating()
+    elif instance.score != instance._saved_score:
+        titles.shift_rating(instance.score - instance._saved_score)
+    else:
+        titles.touch()
+    instance._saved_score = instance.score
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    """Вычитает оценку удалённого отзыва, в том числе при каскаде."""
+    if is_deleting(Title, instance.title_id):
+        return
+    Title.objects.filter(pk=instance.title_id).shift_rating(
+        -instance.score, -1
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_comment_on_save(sender, instance, created, **kwargs):
+    """Увеличивает счётчик комментариев отзыва."""
+    if created:
+        Review.objects.filter(pk=instance.review_id).shift_comment_count(1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_comment_on_delete(sender, instance, **kwargs):
+    """Уменьшает счётчик комментариев, в том числе при каскаде."""
+    if not is_deleting(Review, instance.review_id):
+        Review.objects.filter(pk=instance.review_id).shift_comment_count(-1)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_title_on_comment(sender, instance, **kwargs):
+    """Комментарий меняет версию произведения, к отзыву которого написан."""
+    if is_deleting(Review, instance.review_id):
+        return
+    Title.objects.filter(
+        pk__in=Review.objects.filter(
+            pk=instance.review_id
+        ).values('title_id')
+    ).touch()
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def touch_title_on_genres(sender, instance, action, pk_set, **kwargs):
+    """Изменение жанров меняет версию произведения."""
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Title):
+        Title.objects.filter(pk=instance.pk).touch()
+    elif pk_set:
+        Title.objects.filter(pk__in=pk_set).touch()
+
+
+@receiver(post_save, sender=Category)
+def touch_titles_on_category(sender, instance, created, **kwargs):
+    """Категория встроена в ответ каждого своего произведения."""
+    if not created:
+        Title.objects.filter(category=instance).touch()
+
+
+@receiver(post_save, sender=Genre)
+def touch_titles_on_genre(sender, instance, created, **kwargs):
+    """Жанр встроен в ответ каждого своего произведения."""
+    if not created:
+        Title.objects.filter(genre=instance).touch()
+
+
+@receiver(pre_delete, sender=Genre)
+def touch_titles_on_genre_delete(sender, instance, **kwargs):
+    """Связи с удаляемым жанром исчезнут без сигнала m2m_changed."""
+    Title.objects.filter(genre=instance).touch()
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def touch_titles_on_username(sender, instance, created, **kwargs):
+    """Имя автора встроено в ответы его отзывов и комментариев."""
+    if not created and instance.username != instance._saved_username:
+        Title.objects.filter(
+            Q(pk__in=Review.objects.filter(
+                author=instance
+            ).values('title_id'))
+            | Q(pk__in=Review.objects.filter(
+                comments__author=instance
+            ).values('title_id'))
+        ).touch()
+    instance._saved_username = instance.username
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
-from .models import User
+from .models import OutgoingEmail, User
 
 admin.site.unregister(Group)
 
@@ -19,3 +19,19 @@ class UserAdmin(UserAdmin):
     search_fields = ('username',)
     list_filter = ('role',)
     empty_value_display = '-пусто-'
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    """Административный класс для очереди исходящих писем."""
+
+    list_display = (
+        'to',
+        'subject',
+        'created',
+        'attempts',
+        'next_attempt',
+    )
+    search_fields = ('to',)
+    readonly_fields = ('created', 'claim', 'last_error')
+    empty_value_display = '-пусто-'
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Растёт при смене данных, зашитых в токен доступа.', verbose_name='Версия токенов'),
+        ),
+    ]
@@ -1,14 +1,31 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from users.enums import UserRole
 from users.validators import validate_username
 
 MAX_FIELD_LENGTH = 150
 MAX_EMAIL_LENGTH = 254
+# Поля, которые копируются в утверждения токена доступа.
+TOKEN_CLAIM_FIELDS = ('username', 'role', 'is_staff', 'is_superuser',
+                      'is_active')
 
 
-class User(AbstractUser):
+class UserRoleMixin:
+    """Права по роли; общие для модели и пользователя из токена."""
+
+    @property
+    def is_admin(self):
+        return (self.role == UserRole.ADMIN.value
+                or self.is_superuser or self.is_staff)
+
+    @property
+    def is_moderator(self):
+        return self.role == UserRole.MODERATOR.value
+
+
+class User(UserRoleMixin, AbstractUser):
     """Модель пользователя."""
 
     email = models.EmailField(
@@ -42,17 +59,63 @@ class User(AbstractUser):
         default=UserRole.USER.value,
         max_length=MAX_FIELD_LENGTH
     )
+    token_version = models.PositiveIntegerField(
+        verbose_name='Версия токенов',
+        default=0,
+        editable=False,
+        help_text='Растёт при смене данных, зашитых в токен доступа.'
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('date_joined',)
 
-    @property
-    def is_admin(self):
-        return (self.role == UserRole.ADMIN.value
-                or self.is_superuser or self.is_staff)
 
-    @property
-    def is_moderator(self):
-        return self.role == UserRole.MODERATOR.value
+class OutgoingEmail(models.Model):
+    """
+    Письмо в очереди на отправку.
+
+    Запрос только сохраняет письмо, отправляет его users.outbox.drain.
+    Отправленные письма удаляются; next_attempt пуст у писем, для
+    которых исчерпаны попытки.
+    """
+
+    subject = models.CharField(verbose_name='Тема', max_length=255)
+    body = models.TextField(verbose_name='Текст')
+    from_email = models.CharField(
+        verbose_name='Отправитель',
+        max_length=MAX_EMAIL_LENGTH
+    )
+    to = models.EmailField(
+        verbose_name='Получатель',
+        max_length=MAX_EMAIL_LENGTH
+    )
+    created = models.DateTimeField(
+        verbose_name='Создано',
+        auto_now_add=True
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток',
+        default=0
+    )
+    next_attempt = models.DateTimeField(
+        verbose_name='Следующая попытка',
+        null=True,
+        db_index=True,
+        default=timezone.now
+    )
+    claim = models.CharField(
+        verbose_name='Метка обработчика',
+        max_length=32,
+        blank=True
+    )
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ('next_attempt', 'id')
+
+    def __str__(self):
+        return f'{self.to}: {self.subject}'
@@ -0,0 +1,188 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+# Один поток: письма процесса уходят по одному SMTP-соединению.
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbox')
+# Будильник фонового потока к ближайшему сроку повторной отправки.
+retry_timer = None
+
+
+def enqueue(subject, body, to, from_email=None):
+    """
+    Ставит письмо в очередь и планирует отправку после коммита.
+
+    EMAIL_OUTBOX_WORKER выбирает, кто разбирает очередь: 'thread' -
+    фоновый поток процесса, 'command' - отдельный процесс send_outbox,
+    'sync' - сам запрос после коммита (для тестов и отладки).
+    """
+    message = OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_HOST_USER,
+        to=to,
+    )
+    worker = settings.EMAIL_OUTBOX_WORKER
+    if worker == 'sync':
+        transaction.on_commit(drain)
+    elif worker == 'thread':
+        transaction.on_commit(lambda: executor.submit(drain_in_thread))
+    return message
+
+
+def claim_batch(batch_size):
+    """Забирает пачку писем, которые пора отправить, под меткой обработчика."""
+    now = timezone.now()
+    ids = list(
+        OutgoingEmail.objects.filter(
+            next_attempt__lte=now
+        ).values_list('pk', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    claim = uuid.uuid4().hex
+    # Аренда: до её истечения письма не возьмёт другой обработчик.
+    OutgoingEmail.objects.filter(pk__in=ids, next_attempt__lte=now).update(
+        claim=claim,
+        next_attempt=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+    )
+    return list(OutgoingEmail.objects.filter(pk__in=ids, claim=claim))
+
+
+def postpone(message, error):
+    """Откладывает письмо с экспоненциальной задержкой."""
+    attempts = message.attempts + 1
+    if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        next_attempt = None
+        logger.error('Письмо %s не отправлено: %s', message.pk, error)
+    else:
+        next_attempt = timezone.now() + timedelta(
+            seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+        )
+    OutgoingEmail.objects.filter(pk=message.pk, claim=message.claim).update(
+        attempts=attempts,
+        next_attempt=next_attempt,
+        claim='',
+        last_error=str(error),
+    )
+
+
+class Courier:
+    """
+    Отправляет письма по одному соединению с почтовым сервером.
+
+    Соединение переоткрывается после ошибки отправки. Если открыть его
+    не удалось, сервер считается недоступным до конца разбора.
+    """
+
+    def __init__(self):
+        self.connection = None
+        self.error = None
+
+    @property
+    def unreachable(self):
+        return self.error is not None
+
+    def send(self, message):
+        if self.unreachable:
+            postpone(message, self.error)
+            return False
+        try:
+            if self.connection is None:
+                self.connection = get_connection(fail_silently=False)
+                self.connection.open()
+        except Exception as error:
+            self.connection = None
+            self.error = error
+            postpone(message, error)
+            return False
+        try:
+            self.connection.send_messages([EmailMessage(
+                message.subject,
+                message.body,
+                message.from_email,
+                [message.to],
+                connection=self.connection,
+            )])
+        except Exception as error:
+            postpone(message, error)
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def drain(batch_size=None):
+    """
+    Отправляет все письма, которым подошёл срок, пачками.
+
+    Возвращает число отправленных и отложенных писем.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    sent = failed = 0
+    courier = Courier()
+    try:
+        while not courier.unreachable:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            delivered = [
+                message.pk for message in batch if courier.send(message)
+            ]
+            OutgoingEmail.objects.filter(pk__in=delivered).delete()
+            sent += len(delivered)
+            failed += len(batch) - len(delivered)
+    finally:
+        courier.close()
+    return sent, failed
+
+
+def start_worker():
+    """Разбирает оставшуюся очередь при старте процесса в режиме 'thread'."""
+    if settings.EMAIL_OUTBOX_WORKER == 'thread':
+        executor.submit(drain_in_thread)
+
+
+def schedule_retry():
+    """
+    Будит фоновый поток к ближайшему сроку письма в очереди: отложенные
+    письма уходят, даже если новых регистраций больше не будет.
+    Вызывается только из потока очереди, будильник всегда один.
+    """
+    global retry_timer
+    if retry_timer is not None:
+        retry_timer.cancel()
+        retry_timer = None
+    next_attempt = OutgoingEmail.objects.filter(
+        next_attempt__isnull=False
+    ).values_list('next_attempt', flat=True).first()
+    if next_attempt is None:
+        return
+    delay = max(0, (next_attempt - timezone.now()).total_seconds())
+    retry_timer = threading.Timer(delay, executor.submit, (drain_in_thread,))
+    retry_timer.daemon = True
+    retry_timer.start()
+
+
+def drain_in_thread():
+    try:
+        drain()
+        schedule_retry()
+    except Exception:
+        logger.exception('Ошибка разбора очереди писем')
+    finally:
+        connections.close_all()
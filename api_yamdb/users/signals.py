@@ -0,0 +1,23 @@
+from django.db.models.signals import post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import TOKEN_CLAIM_FIELDS, User
+
+
+def claims_of(instance):
+    return tuple(instance.__dict__.get(field) for field in TOKEN_CLAIM_FIELDS)
+
+
+@receiver(post_init, sender=User)
+@receiver(post_save, sender=User)
+def remember_claims(sender, instance, **kwargs):
+    instance._saved_claims = claims_of(instance)
+
+
+@receiver(pre_save, sender=User)
+def bump_token_version(sender, instance, **kwargs):
+    """Отзывает выданные токены, если изменились их утверждения."""
+    if not instance._state.adding and (
+        claims_of(instance) != instance._saved_claims
+    ):
+        instance.token_version += 1
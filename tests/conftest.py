@@ -1,6 +1,7 @@
 import os
 import sys
 
+import pytest
 from django.utils.version import get_version
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -33,3 +34,22 @@ assert get_version() < '4.0.0', 'Пожалуйста, используйте в
 pytest_plugins = [
     'tests.fixtures.fixture_user',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    from django.core.cache import caches
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def send_outbox_on_commit(settings):
+    # Письма уходят сразу после запроса, а не в фоновом потоке.
+    settings.EMAIL_OUTBOX_WORKER = 'sync'
+
+
+@pytest.fixture(autouse=True)
+def read_from_primary(settings):
+    # Тесты с репликой включают её сами и разрешают запросы к ней.
+    settings.READ_REPLICA = None
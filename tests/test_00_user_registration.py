@@ -375,3 +375,195 @@ class Test00UserRegistration:
             'пользователя, созданного администратором,  возвращает ответ '
             'со статусом 200.'
         )
+
+    def test_token_role_claims(self, client, admin_client, user,
+                               django_assert_num_queries):
+        from django.contrib.auth.tokens import default_token_generator
+        from rest_framework.test import APIClient
+
+        response = client.post(self.URL_TOKEN, data={
+            'username': user.username,
+            'confirmation_code': default_token_generator.make_token(user)
+        })
+        assert response.status_code == HTTPStatus.OK
+        user_client = APIClient()
+        user_client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.json()["token"]}'
+        )
+
+        # Первый запрос подтягивает версию токенов, дальше база не нужна.
+        user_client.get(self.URL_ADMIN_CREATE_USER)
+        with django_assert_num_queries(0):
+            response = user_client.get(self.URL_ADMIN_CREATE_USER)
+        assert response.status_code == HTTPStatus.FORBIDDEN, (
+            'Проверьте, что права по токену проверяются по его утверждениям '
+            'без запросов к базе.'
+        )
+        response = user_client.get('/api/v1/users/me/')
+        assert response.json()['bio'] == user.bio
+
+        admin_client.patch(
+            f'{self.URL_ADMIN_CREATE_USER}{user.username}/',
+            data={'role': 'admin'}
+        )
+        response = user_client.get(self.URL_ADMIN_CREATE_USER)
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что смена роли сразу действует для выданных токенов.'
+        )
+
+        user.refresh_from_db()
+        user.is_active = False
+        user.save()
+        response = user_client.get(self.URL_ADMIN_CREATE_USER)
+        assert response.status_code == HTTPStatus.UNAUTHORIZED, (
+            'Проверьте, что токены заблокированного пользователя отзываются.'
+        )
+
+    def test_signup_email_outbox(self, client, settings, tmp_path):
+        from django.core.management import call_command
+
+        from users.models import OutgoingEmail
+
+        settings.EMAIL_OUTBOX_WORKER = 'command'
+        outbox_before_count = len(mail.outbox)
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'queued@yamdb.fake', 'username': 'queued'
+        })
+        assert response.status_code == HTTPStatus.OK
+        assert len(mail.outbox) == outbox_before_count, (
+            'Проверьте, что регистрация не отправляет письмо в запросе.'
+        )
+        assert OutgoingEmail.objects.filter(to='queued@yamdb.fake').exists()
+
+        # Почтовый сервер недоступен: письмо откладывается на потом.
+        settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+        settings.EMAIL_HOST, settings.EMAIL_PORT = '127.0.0.1', 1
+        call_command('send_outbox')
+        message = OutgoingEmail.objects.get()
+        assert message.attempts == 1 and message.last_error
+        assert message.next_attempt > message.created
+
+        OutgoingEmail.objects.update(next_attempt=message.created)
+        settings.EMAIL_BACKEND = (
+            'django.core.mail.backends.filebased.EmailBackend'
+        )
+        settings.EMAIL_FILE_PATH = tmp_path
+        call_command('send_outbox')
+        assert not OutgoingEmail.objects.exists()
+        sent = ''.join(path.read_text() for path in tmp_path.iterdir())
+        assert 'queued@yamdb.fake' in sent and 'Код подтверждения' in sent
+
+    def test_signup_email_outbox_thread_retry(self, client, settings,
+                                              tmp_path):
+        import time
+
+        from users.models import OutgoingEmail
+        from users.outbox import executor
+
+        settings.EMAIL_OUTBOX_WORKER = 'thread'
+        settings.EMAIL_OUTBOX_RETRY_DELAY = 0.2
+        settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+        settings.EMAIL_HOST, settings.EMAIL_PORT = '127.0.0.1', 1
+        response = client.post(self.URL_SIGNUP, data={
+            'email': 'retry@yamdb.fake', 'username': 'retry'
+        })
+        assert response.status_code == HTTPStatus.OK
+        executor.submit(lambda: None).result(timeout=5)
+        assert OutgoingEmail.objects.get().attempts == 1
+
+        # Сервер снова доступен: письмо уходит без новых регистраций.
+        settings.EMAIL_BACKEND = (
+            'django.core.mail.backends.filebased.EmailBackend'
+        )
+        settings.EMAIL_FILE_PATH = tmp_path
+        deadline = time.monotonic() + 5
+        while OutgoingEmail.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not OutgoingEmail.objects.exists(), (
+            'Проверьте, что фоновый поток сам повторяет отложенные письма.'
+        )
+        executor.submit(lambda: None).result(timeout=5)
+        assert 'retry@yamdb.fake' in ''.join(
+            path.read_text() for path in tmp_path.iterdir()
+        )
+
+    def test_signup_and_token_query_budget(self, client,
+                                           django_assert_num_queries):
+        from django.contrib.auth.tokens import default_token_generator
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from users.models import User
+
+        data = {'email': 'burst@yamdb.fake', 'username': 'burst'}
+        for expected_selects in (0, 1):
+            with CaptureQueriesContext(connection) as context:
+                response = client.post(self.URL_SIGNUP, data=data)
+            assert response.status_code == HTTPStatus.OK
+            user_selects = [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT')
+                and 'FROM "users_user"' in query['sql']
+            ]
+            assert len(user_selects) == expected_selects, (
+                'Проверьте, что новая регистрация сразу вставляет '
+                'пользователя, а повторная читает его одним запросом.'
+            )
+
+        user = User.objects.get(username='burst')
+        with django_assert_num_queries(1):
+            response = client.post(self.URL_TOKEN, data={
+                'username': 'burst',
+                'confirmation_code': default_token_generator.make_token(user)
+            })
+        assert response.status_code == HTTPStatus.OK
+
+    def test_auth_throttling(self, client, monkeypatch,
+                             django_assert_num_queries):
+        from api.throttling import SlidingWindowThrottle
+
+        clock = [1000.0]
+        monkeypatch.setattr(
+            SlidingWindowThrottle, 'THROTTLE_RATES', {'auth': '3/minute'}
+        )
+        monkeypatch.setattr(SlidingWindowThrottle, 'timer', lambda _: clock[0])
+
+        for _ in range(3):
+            response = client.post(self.URL_TOKEN, data={})
+            assert response.status_code == HTTPStatus.BAD_REQUEST
+        with django_assert_num_queries(0):
+            response = client.post(self.URL_SIGNUP, data={})
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            f'Проверьте, что `{self.URL_SIGNUP}` и `{self.URL_TOKEN}` '
+            'ограничивают частоту запросов с одного адреса.'
+        )
+        response = client.post(
+            self.URL_SIGNUP, data={}, HTTP_X_FORWARDED_FOR='10.0.0.1'
+        )
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            'Проверьте, что заголовок X-Forwarded-For от клиента не '
+            'обходит ограничение частоты.'
+        )
+        retry_after = int(response['Retry-After'])
+        assert retry_after > 0
+
+        clock[0] += retry_after - 1
+        response = client.post(self.URL_SIGNUP, data={})
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        clock[0] += 1
+        response = client.post(self.URL_SIGNUP, data={})
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (
+            'Проверьте, что после `Retry-After` запрос снова принимается.'
+        )
+
+    def test_auth_throttling_shared_cache_check(self, settings):
+        from api.checks import check_shared_api_cache
+
+        assert [
+            warning.id for warning in check_shared_api_cache(None)
+        ] == ['api.W001'], (
+            'Проверьте, что check --deploy предупреждает о кэше счётчиков '
+            'в памяти процесса.'
+        )
+        settings.API_RESPONSE_CACHE = 'filebased'
+        assert check_shared_api_cache(None) == []
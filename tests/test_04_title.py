@@ -1,6 +1,9 @@
 from http import HTTPStatus
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from reviews.models import Title
 
 from tests.utils import (
     check_pagination, check_permissions, create_categories, create_genre,
@@ -274,6 +277,14 @@ class Test04TitleAPI:
             f'`{self.TITLES_DETAIL_URL_TEMPLATE}` удаляет произведение из '
             'базы данных.'
         )
+        for url in (
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id='abc'),
+            '/api/v1/titles/abc/reviews/',
+        ):
+            assert client.get(url).status_code == HTTPStatus.NOT_FOUND, (
+                f'Проверьте, что GET-запрос к `{url}` с некорректным id '
+                'возвращает ответ со статусом 404.'
+            )
 
     def test_04_titles_name_length_validation(self, admin_client):
         genres = create_genre(admin_client)
@@ -353,3 +364,213 @@ class Test04TitleAPI:
             f'Проверьте, что PUT-запрос к `{self.TITLES_DETAIL_URL_TEMPLATE} '
             'не предусмотрен и возвращает статус 405.'
         )
+
+    def test_07_titles_cursor_pagination(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        for title in titles:
+            for idx in range(2):
+                admin_client.post(self.TITLES_URL, data={
+                    **title, 'name': f'{title["name"]} {idx}'
+                })
+        ratings = iter((7.5, 7.5, None, 3.0, 7.5, None))
+        for title in Title.objects.order_by('id'):
+            Title.objects.filter(pk=title.pk).update(rating=next(ratings))
+        expected = list(
+            Title.objects.order_by('-rating', 'id').values_list('id', flat=True)
+        )
+
+        url = f'{self.TITLES_URL}?pagination=cursor&limit=4'
+        seen = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что курсорная пагинация `{self.TITLES_URL}` '
+                'возвращает ответ со статусом 200.'
+            )
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что курсорная пагинация не считает общее '
+                'количество объектов.'
+            )
+            seen.extend(element['id'] for element in data['results'])
+            last_page = data
+            url = data['next']
+        assert seen == expected, (
+            'Проверьте, что курсорная пагинация выдаёт каждое произведение '
+            'ровно один раз в порядке (rating, id).'
+        )
+
+        response = client.get(last_page['previous'])
+        assert [element['id'] for element in response.json()['results']] == (
+            expected[:4]
+        ), (
+            'Проверьте, что ссылка `previous` курсорной пагинации ведёт на '
+            'предыдущую страницу.'
+        )
+
+    @pytest.mark.parametrize('limit', (1, 10, 100))
+    def test_08_titles_query_count(self, client, admin_client,
+                                   django_assert_num_queries, limit):
+        titles, _, _ = create_titles(admin_client)
+        for idx in range(10):
+            admin_client.post(self.TITLES_URL, data={
+                **titles[idx % 2], 'name': f'Произведение {idx}'
+            })
+
+        # COUNT(*), страница произведений с категориями, жанры страницы.
+        with django_assert_num_queries(3):
+            response = client.get(f'{self.TITLES_URL}?limit={limit}')
+        assert response.status_code == HTTPStatus.OK
+        # Версия для ETag, произведение с категорией, жанры.
+        with django_assert_num_queries(3):
+            response = client.get(
+                self.TITLES_DETAIL_URL_TEMPLATE.format(
+                    title_id=titles[0]['id']
+                )
+            )
+        assert response.status_code == HTTPStatus.OK
+
+    def test_09_titles_full_text_search(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        admin_client.post(self.TITLES_URL, data={
+            **titles[1], 'name': 'Орешки', 'description': 'Крепкий сюжет'
+        })
+
+        response = client.get(f'{self.TITLES_URL}?search=крепк')
+        assert response.status_code == HTTPStatus.OK
+        names = [element['name'] for element in response.json()['results']]
+        assert names == ['Крепкий орешек', 'Орешки'], (
+            f'Проверьте, что поиск `{self.TITLES_URL}?search=` не зависит '
+            'от регистра, ищет по названию и описанию и сортирует '
+            'результаты по релевантности.'
+        )
+
+        admin_client.patch(
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=titles[1]['id']),
+            data={'name': 'Die Hard'}
+        )
+        admin_client.delete(
+            self.TITLES_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        )
+        response = client.get(f'{self.TITLES_URL}?search=die')
+        assert [e['name'] for e in response.json()['results']] == [
+            'Die Hard'
+        ], (
+            'Проверьте, что поисковый индекс обновляется при изменении '
+            'произведения.'
+        )
+        response = client.get(f'{self.TITLES_URL}?search=терминатор')
+        assert response.json()['count'] == 0, (
+            'Проверьте, что поисковый индекс обновляется при удалении '
+            'произведения.'
+        )
+
+    def test_10_titles_multi_value_filters(self, client, admin_client):
+        titles, categories, genres = create_titles(admin_client)
+        url = self.TITLES_URL
+
+        def names(query):
+            response = client.get(f'{url}?{query}')
+            assert response.status_code == HTTPStatus.OK
+            return {element['name'] for element in response.json()['results']}
+
+        assert names('genre=horror,drama') == {
+            titles[0]['name'], titles[1]['name']
+        }, (
+            f'Проверьте, что фильтр `{url}?genre=` принимает несколько '
+            'слагов через запятую.'
+        )
+        assert names('genre=horror,comedy&genre_mode=all') == {
+            titles[0]['name']
+        }
+        assert names('genre=horror,drama&genre_mode=all') == set()
+        assert names('genre=hor') == set(), (
+            f'Проверьте, что фильтр `{url}?genre=` ищет точное совпадение '
+            'слага.'
+        )
+        assert names(f'category={categories[1]["slug"]}') == {
+            titles[1]['name']
+        }
+        response = client.get(f'{url}?genre=horror&genre_mode=some')
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_11_titles_write_uses_stored_rating(self, admin_client,
+                                                user_client, moderator_client):
+        titles, _, _ = create_titles(admin_client)
+        title_url = self.TITLES_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+        for client, score in ((user_client, 4), (moderator_client, 7)):
+            client.post(f'{title_url}reviews/', data={
+                'text': 'Отзыв', 'score': score
+            })
+
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.patch(title_url, data={'name': 'Новое'})
+        assert response.status_code == HTTPStatus.OK
+        assert response.json().get('rating') == 5, (
+            f'Проверьте, что ответ на PATCH-запрос к `{title_url}` '
+            'содержит рейтинг произведения.'
+        )
+        assert not any(
+            'reviews_review' in query['sql'] for query in context.captured_queries
+        ), (
+            'Проверьте, что PATCH-запрос к произведению не читает отзывы.'
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.delete(title_url)
+        assert response.status_code == HTTPStatus.NO_CONTENT
+        assert not any(
+            query['sql'].startswith('UPDATE')
+            for query in context.captured_queries
+        ), (
+            'Проверьте, что при удалении произведения рейтинг не '
+            'пересчитывается для каждого каскадно удалённого отзыва.'
+        )
+
+    def test_12_titles_anonymous_response_cache(self, client, admin_client,
+                                                user_client):
+        titles, categories, _ = create_titles(admin_client)
+        title_url = self.TITLES_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+        for url in (self.TITLES_URL, title_url):
+            assert client.get(url)['X-Cache'] == 'MISS'
+            assert client.get(url)['X-Cache'] == 'HIT', (
+                f'Проверьте, что повторный анонимный GET-запрос к `{url}` '
+                'отдаётся из кэша.'
+            )
+        assert client.get(f'{self.TITLES_URL}?limit=1')['X-Cache'] == 'MISS'
+        response = client.get(
+            f'{self.TITLES_URL}?limit=1', HTTP_HOST='evil.example'
+        )
+        assert response['X-Cache'] == 'MISS'
+        assert 'evil.example' not in client.get(
+            f'{self.TITLES_URL}?limit=1'
+        ).json()['next'], (
+            'Проверьте, что ключ кэша учитывает хост: ссылки пагинации '
+            'в ответе абсолютные.'
+        )
+        assert 'X-Cache' not in user_client.get(self.TITLES_URL)
+
+        user_client.post(f'{title_url}reviews/', data={
+            'text': 'Отзыв', 'score': 9
+        })
+        response = client.get(title_url)
+        assert response['X-Cache'] == 'MISS'
+        assert response.json()['rating'] == 9, (
+            'Проверьте, что новый отзыв сбрасывает кэш произведения.'
+        )
+        other_url = self.TITLES_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[1]['id']
+        )
+        client.get(other_url)
+        assert client.get(other_url)['X-Cache'] == 'HIT', (
+            'Проверьте, что отзыв сбрасывает кэш только своего произведения.'
+        )
+
+        admin_client.delete(f'/api/v1/categories/{categories[1]["slug"]}/')
+        assert client.get(other_url).status_code == HTTPStatus.NOT_FOUND, (
+            'Проверьте, что изменение категории сбрасывает кэш произведений.'
+        )
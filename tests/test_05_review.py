@@ -1,7 +1,9 @@
 from http import HTTPStatus
 
 import pytest
+from django.db import connection
 from django.db.utils import IntegrityError
+from django.test.utils import CaptureQueriesContext
 
 from tests.utils import (
     check_fields, check_pagination, create_reviews, create_single_review,
@@ -413,3 +415,142 @@ class Test05ReviewAPI:
             f'Проверьте, что PUT-запрос к `{self.REVIEW_DETAIL_URL_TEMPLATE} '
             'не предусмотрен и возвращает статус 405.'
         )
+
+    def test_07_rating_follows_review_changes(self, admin_client, admin,
+                                              user_client, user,
+                                              moderator_client, moderator):
+        author_map = {
+            admin: admin_client,
+            user: user_client,
+            moderator: moderator_client
+        }
+        reviews, titles = create_reviews(admin_client, author_map)
+        title_url = self.TITLE_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id']
+        )
+
+        user_client.patch(
+            self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[1]['id']
+            ),
+            data={'score': 8}
+        )
+        assert admin_client.get(title_url).json().get('rating') == 6, (
+            'Проверьте, что после изменения оценки отзыва рейтинг '
+            'произведения пересчитывается.'
+        )
+
+        user.delete()
+        assert admin_client.get(title_url).json().get('rating') == 5, (
+            'Проверьте, что рейтинг произведения пересчитывается при '
+            'каскадном удалении отзывов.'
+        )
+
+        for review in (reviews[0], reviews[2]):
+            admin_client.delete(
+                self.REVIEW_DETAIL_URL_TEMPLATE.format(
+                    title_id=titles[0]['id'], review_id=review['id']
+                )
+            )
+        assert admin_client.get(title_url).json().get('rating') is None, (
+            'Проверьте, что после удаления всех отзывов рейтинг '
+            'произведения становится равным `None`.'
+        )
+
+    def test_08_create_relies_on_unique_constraint(self, admin_client,
+                                                   user_client, user):
+        titles, _, _ = create_titles(admin_client)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        data = {'text': 'Отличный фильм', 'score': 8}
+
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, data=data)
+        assert response.status_code == HTTPStatus.CREATED
+        reads = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "users_user"' not in query['sql']
+        ]
+        assert not reads, (
+            f'Проверьте, что POST-запрос к `{self.REVIEWS_URL_TEMPLATE}` не '
+            'читает произведение и отзывы перед вставкой.'
+        )
+
+        response = user_client.post(url, data={'text': 'Ещё раз', 'score': 1})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert response.json() == {
+            'non_field_errors': ['Нельзя дублировать отзыв!']
+        }, (
+            'Проверьте, что повторный отзыв возвращает прежнюю ошибку.'
+        )
+        title = admin_client.get(
+            self.TITLE_DETAIL_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        ).json()
+        assert title['rating'] == 8, (
+            'Проверьте, что отклонённый повторный отзыв не меняет рейтинг.'
+        )
+
+        response = user_client.post(
+            self.REVIEWS_URL_TEMPLATE.format(title_id='999'), data=data
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+        assert not user.reviews.filter(title_id=999).exists()
+
+    def test_09_rating_with_stale_review_copies(self, admin_client,
+                                                user_client):
+        from reviews.models import Review, Title
+
+        titles, _, _ = create_titles(admin_client)
+        response = user_client.post(
+            self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id']),
+            data={'text': 'Отзыв', 'score': 5}
+        )
+        # Автор и модератор загрузили отзыв до того, как любой из них
+        # сохранил правку.
+        first = Review.objects.get(pk=response.json()['id'])
+        second = Review.objects.get(pk=first.pk)
+        first.score = 7
+        first.save()
+        second.score = 3
+        second.save()
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.rating) == (3, 3), (
+            'Проверьте, что рейтинг считается от сохранённой оценки, '
+            'а не от оценки, загруженной вместе с устаревшей копией отзыва.'
+        )
+
+    def test_10_failed_cascade_keeps_counters_live(self, admin_client,
+                                                   user_client):
+        from django.db import DatabaseError
+        from django.db.models.signals import post_delete
+
+        from reviews.deleting import is_deleting
+        from reviews.models import Review, Title
+
+        titles, _, _ = create_titles(admin_client)
+        url = self.REVIEWS_URL_TEMPLATE.format(title_id=titles[0]['id'])
+        review_id = user_client.post(
+            url, data={'text': 'Отзыв', 'score': 4}
+        ).json()['id']
+        admin_client.post(url, data={'text': 'Отзыв', 'score': 8})
+        title = Title.objects.get(pk=titles[0]['id'])
+
+        def fail(**kwargs):
+            raise DatabaseError('database is locked')
+
+        # Каскад обрывается после отметки произведения как удаляемого.
+        post_delete.connect(fail, sender=Review)
+        try:
+            with pytest.raises(DatabaseError):
+                title.delete()
+        finally:
+            post_delete.disconnect(fail, sender=Review)
+        assert not is_deleting(Title, title.pk)
+
+        user_client.delete(self.REVIEW_DETAIL_URL_TEMPLATE.format(
+            title_id=title.pk, review_id=review_id
+        ))
+        assert Title.objects.get(pk=title.pk).rating == 8, (
+            'Проверьте, что оборвавшееся удаление произведения не отключает '
+            'пересчёт рейтинга при следующих удалениях отзывов.'
+        )
@@ -1,9 +1,12 @@
 from http import HTTPStatus
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from tests.utils import (check_fields, check_pagination, create_comments,
-                         create_reviews, create_single_comment)
+                         create_reviews, create_single_comment,
+                         create_titles)
 
 
 @pytest.mark.django_db(transaction=True)
@@ -366,3 +369,269 @@ class Test06CommentAPI:
             f'Проверьте, что PUT-запрос к `{self.COMMENT_DETAIL_URL_TEMPLATE} '
             'не предусмотрен и возвращает статус 405.'
         )
+
+    def test_08_conditional_get(self, client, admin_client, admin,
+                                user_client, user, django_assert_num_queries):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        urls = (
+            title_url,
+            f'{title_url}reviews/',
+            self.COMMENTS_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=reviews[0]['id']
+            ),
+        )
+        etags = {}
+        for url in urls:
+            response = client.get(url)
+            assert response.has_header('ETag'), (
+                f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+                'заголовок `ETag`.'
+            )
+            assert response.has_header('Last-Modified')
+            etags[url] = response['ETag']
+            with django_assert_num_queries(1):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+                f'Проверьте, что GET-запрос к `{url}` с актуальным '
+                '`If-None-Match` возвращает ответ со статусом 304.'
+            )
+
+        create_single_comment(
+            user_client, titles[0]['id'], reviews[1]['id'], 'Новый'
+        )
+        for url in urls:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == HTTPStatus.OK, (
+                f'Проверьте, что новый комментарий меняет `ETag` для `{url}`.'
+            )
+
+        etags = {url: client.get(url)['ETag'] for url in urls}
+        user.username = 'renamed'
+        user.save()
+        response = client.get(urls[1], HTTP_IF_NONE_MATCH=etags[urls[1]])
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что смена имени автора меняет `ETag` отзывов и '
+            'комментариев: имя встроено в ответ.'
+        )
+        assert 'renamed' in {
+            review['author'] for review in response.json()['results']
+        }
+
+    def test_09_review_comments_count(self, admin_client, admin,
+                                      user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        review_url = (
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/'
+        )
+
+        def comments_count():
+            return admin_client.get(review_url).json().get('comments_count')
+
+        assert comments_count() == len(comments), (
+            f'Проверьте, что ответ на GET-запрос к `{review_url}` содержит '
+            'поле `comments_count` с числом комментариев к отзыву.'
+        )
+        admin_client.delete(self.COMMENT_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id'],
+            comment_id=comments[0]['id']
+        ))
+        assert comments_count() == len(comments) - 1, (
+            'Проверьте, что удаление комментария уменьшает `comments_count`.'
+        )
+        user.delete()
+        assert comments_count() == len(comments) - 2, (
+            'Проверьте, что каскадное удаление комментариев вместе с автором '
+            'уменьшает `comments_count`.'
+        )
+
+    def test_10_parent_review_loaded_once(self, admin_client, admin,
+                                          user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        )
+        detail_url = f'{url}{comments[1]["id"]}/'
+        requests = (
+            ('post', url, {'text': 'Новый'}, 1),
+            ('get', url, None, 1),
+            ('get', detail_url, None, 0),
+            ('patch', detail_url, {'text': 'Изменён'}, 0),
+        )
+        for method, request_url, data, expected in requests:
+            with CaptureQueriesContext(connection) as context:
+                getattr(user_client, method)(request_url, data=data)
+            selects = [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT "reviews_review"')
+            ]
+            assert len(selects) == expected, (
+                f'Проверьте, что {method.upper()}-запрос к `{request_url}` '
+                f'загружает отзыв не более {expected} раз(а).'
+            )
+
+    def test_11_author_not_loaded_per_object(self, admin_client, admin,
+                                             user_client, user):
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(admin_client, author_map)
+        review_url = (
+            f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[1]["id"]}/'
+        )
+        comment_url = self.COMMENT_DETAIL_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id'],
+            comment_id=comments[1]['id']
+        )
+        requests = (
+            ('get', f'/api/v1/titles/{titles[0]["id"]}/reviews/', None),
+            ('get', comment_url.rsplit('/', 2)[0] + '/', None),
+            ('patch', review_url, {'text': 'Изменён'}),
+            ('patch', comment_url, {'text': 'Изменён'}),
+            ('delete', comment_url, None),
+            ('delete', review_url, None),
+        )
+        for method, url, data in requests:
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(user_client, method)(url, data=data)
+            assert response.status_code < HTTPStatus.BAD_REQUEST
+            user_selects = [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith('SELECT "users_user"')
+            ]
+            # Единственная выборка пользователя - аутентификация запроса.
+            assert len(user_selects) == 1, (
+                f'Проверьте, что {method.upper()}-запрос к `{url}` не '
+                'загружает автора для каждого объекта отдельно.'
+            )
+
+    @pytest.mark.parametrize('limit', (10, 100))
+    def test_12_nested_lists_query_count(self, client, admin_client,
+                                         django_assert_num_queries, limit):
+        from reviews.models import Comment, Review
+        from users.models import User
+
+        titles, _, _ = create_titles(admin_client)
+        User.objects.bulk_create(
+            User(username=f'reader{idx}', email=f'reader{idx}@yamdb.fake')
+            for idx in range(limit)
+        )
+        authors = User.objects.filter(username__startswith='reader')
+        Review.objects.bulk_create(
+            Review(title_id=titles[0]['id'], author=author, text='Отзыв',
+                   score=5)
+            for author in authors
+        )
+        reviews = Review.objects.filter(title_id=titles[0]['id'])
+        Comment.objects.bulk_create(
+            Comment(review=reviews[0], author=author, text='Комментарий')
+            for author in authors
+        )
+        reviews_url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        comments_url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0].pk
+        )
+        for url in (reviews_url, comments_url):
+            # Версия для ETag, родительский объект, COUNT(*) и страница
+            # с именами авторов.
+            with django_assert_num_queries(4):
+                response = client.get(f'{url}?limit={limit}')
+            assert response.status_code == HTTPStatus.OK
+            results = response.json()['results']
+            assert len(results) == limit
+            assert all(item['author'].startswith('reader')
+                       for item in results), (
+                f'Проверьте, что ответ на GET-запрос к `{url}` содержит '
+                'имена авторов.'
+            )
+
+    def test_13_nested_cursor_pagination(self, client, admin_client):
+        from django.utils import timezone
+
+        from reviews.models import Comment, Review
+        from users.models import User
+
+        titles, _, _ = create_titles(admin_client)
+        User.objects.bulk_create(
+            User(username=f'reader{idx}', email=f'reader{idx}@yamdb.fake')
+            for idx in range(7)
+        )
+        authors = list(User.objects.filter(username__startswith='reader'))
+        Review.objects.bulk_create(
+            Review(title_id=titles[0]['id'], author=author, text='Отзыв',
+                   score=5)
+            for author in authors
+        )
+        review = Review.objects.filter(title_id=titles[0]['id']).first()
+        Comment.objects.bulk_create(
+            Comment(review=review, author=author, text='Комментарий')
+            for author in authors
+        )
+        # Одинаковые даты проверяют порядок по id внутри равного ключа.
+        moment = timezone.now()
+        for model in (Review, Comment):
+            model.objects.filter(pk__lte=3).update(pub_date=moment)
+            model.objects.filter(pk__gt=5).update(pub_date=moment)
+
+        for model, url in (
+            (Review, f'/api/v1/titles/{titles[0]["id"]}/reviews/'),
+            (Comment, self.COMMENTS_URL_TEMPLATE.format(
+                title_id=titles[0]['id'], review_id=review.pk
+            )),
+        ):
+            expected = list(model.objects.order_by(
+                '-pub_date', '-id'
+            ).values_list('id', flat=True))
+            next_url = f'{url}?pagination=cursor&limit=3'
+            seen = []
+            while next_url:
+                response = client.get(next_url)
+                assert response.status_code == HTTPStatus.OK
+                data = response.json()
+                assert 'count' not in data
+                seen.extend(element['id'] for element in data['results'])
+                last_page = data
+                next_url = data['next']
+            assert seen == expected, (
+                f'Проверьте, что курсорная пагинация `{url}` выдаёт каждый '
+                'объект ровно один раз, начиная с новых.'
+            )
+            response = client.get(last_page['previous'])
+            assert [
+                element['id'] for element in response.json()['results']
+            ] == expected[3:6], (
+                'Проверьте, что ссылка `previous` курсорной пагинации ведёт '
+                'на предыдущую страницу.'
+            )
+
+    def test_14_post_throttling(self, admin_client, admin, user_client,
+                                user, monkeypatch):
+        from api.throttling import SlidingWindowThrottle
+
+        monkeypatch.setattr(
+            SlidingWindowThrottle, 'THROTTLE_RATES', {'posts': '3/minute'}
+        )
+        author_map = {admin: admin_client, user: user_client}
+        comments, reviews, titles = create_comments(
+            admin_client, author_map
+        )
+        url = self.COMMENTS_URL_TEMPLATE.format(
+            title_id=titles[0]['id'], review_id=reviews[0]['id']
+        )
+        # Пользователь уже оставил отзыв и комментарий в create_comments.
+        response = user_client.post(url, data={'text': 'Ещё'})
+        assert response.status_code == HTTPStatus.CREATED
+        response = user_client.post(url, data={'text': 'И ещё'})
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS, (
+            'Проверьте, что частота создания отзывов и комментариев '
+            'ограничена для каждого пользователя.'
+        )
+        assert response.has_header('Retry-After')
+        assert user_client.get(url).status_code == HTTPStatus.OK
+        response = user_client.patch(
+            f'{url}{comments[1]["id"]}/', data={'text': 'Правка'}
+        )
+        assert response.status_code == HTTPStatus.OK
+        response = admin_client.post(url, data={'text': 'Ответ'})
+        assert response.status_code == HTTPStatus.CREATED
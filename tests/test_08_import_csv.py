@@ -0,0 +1,260 @@
+import csv
+import gzip
+import shutil
+from http import HTTPStatus
+from pathlib import Path
+
+import pytest
+from django.conf import settings
+from django.core.management import CommandError, call_command
+
+from reviews.models import Comment, Review, Title
+from users.models import User
+
+
+@pytest.mark.django_db(transaction=True)
+class Test08ImportCSV:
+
+    def test_01_import_csv(self, capsys):
+        call_command('import_csv', '--batch-size', '10')
+
+        assert Title.objects.count() == 32
+        assert Title.genre.through.objects.count() == 42
+        assert Review.objects.count() == 72
+        title = Title.objects.get(pk=1)
+        assert title.review_count == title.reviews.count(), (
+            'Проверьте, что после импорта пересчитывается рейтинг '
+            'произведений.'
+        )
+        assert str(Comment.objects.get(pk=1).pub_date.date()) == (
+            '2020-01-13'
+        ), 'Проверьте, что импорт сохраняет даты публикации из CSV.'
+        assert 'строк/с' in capsys.readouterr().out
+
+    def test_02_import_csv_dir_gzip_and_overrides(self, tmp_path, capsys):
+        source = Path(settings.BASE_DIR) / 'static' / 'data'
+        for path in source.glob('*.csv'):
+            if path.name == 'review.csv':
+                continue
+            with open(path, 'rb') as src, gzip.open(
+                    tmp_path / f'{path.name}.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        call_command(
+            'import_csv', '--dir', str(tmp_path), '--progress-every', '20',
+            '--batch-size', '10',
+            '--file', f'review={source / "review.csv"}'
+        )
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert 'Review: 20 строк' in capsys.readouterr().out, (
+            'Проверьте, что импорт периодически сообщает о ходе работы.'
+        )
+
+    def test_03_import_csv_broken_reference(self, tmp_path):
+        source = Path(settings.BASE_DIR) / 'static' / 'data'
+        broken = tmp_path / 'comments.csv'
+        broken.write_text(
+            'id,review_id,text,author,pub_date\n'
+            '1,100500,text,100,2020-01-13T23:20:02.422Z\n',
+            encoding='utf-8'
+        )
+        with pytest.raises(CommandError):
+            call_command(
+                'import_csv', '--dir', str(source),
+                '--file', f'comments={broken}'
+            )
+        assert not Comment.objects.exists()
+
+    def test_04_import_csv_workers(self):
+        call_command('import_csv', '--workers', '2', '--batch-size', '10')
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3
+        assert Title.genre.through.objects.count() == 42
+
+    def test_05_import_csv_resume_from_checkpoint(self, tmp_path):
+        source = Path(settings.BASE_DIR) / 'static' / 'data'
+        checkpoint = tmp_path / 'import.json'
+        broken = tmp_path / 'comments.csv'
+        broken.write_text(
+            'id,review_id,text,author,pub_date\n'
+            '1,100500,text,100,2020-01-13T23:20:02.422Z\n',
+            encoding='utf-8'
+        )
+        with pytest.raises(CommandError):
+            call_command(
+                'import_csv', '--checkpoint', str(checkpoint),
+                '--file', f'comments={broken}', '--batch-size', '10'
+            )
+        assert checkpoint.exists(), (
+            'Проверьте, что прерванный импорт оставляет контрольную точку.'
+        )
+        assert Review.objects.count() == 72
+
+        call_command(
+            'import_csv', '--checkpoint', str(checkpoint),
+            '--batch-size', '10'
+        )
+        assert Review.objects.count() == 72
+        assert Comment.objects.count() == 3, (
+            'Проверьте, что импорт продолжается с места остановки.'
+        )
+        assert not checkpoint.exists()
+
+    def test_06_import_csv_upsert(self, tmp_path, capsys):
+        source = Path(settings.BASE_DIR) / 'static' / 'data'
+        call_command('import_csv')
+        capsys.readouterr()
+        versions = dict(Title.objects.values_list('pk', 'version'))
+        call_command('import_csv', '--upsert')
+        assert 'Review: добавлено 0, изменено 0' in capsys.readouterr().out, (
+            'Проверьте, что повторный импорт с --upsert ничего не меняет.'
+        )
+        assert dict(Title.objects.values_list('pk', 'version')) == versions, (
+            'Проверьте, что повторный импорт без изменений не пересчитывает '
+            'рейтинги произведений.'
+        )
+
+        for path in source.glob('*.csv'):
+            shutil.copy(path, tmp_path / path.name)
+        titles = (tmp_path / 'titles.csv').read_text(encoding='utf-8')
+        (tmp_path / 'titles.csv').write_text(
+            titles.replace('Побег из Шоушенка', 'Побег'), encoding='utf-8'
+        )
+        users = (tmp_path / 'users.csv').read_text(encoding='utf-8')
+        (tmp_path / 'users.csv').write_text(
+            users.replace('capt_obvious@yamdb.fake,admin', (
+                'capt_obvious@yamdb.fake,user'
+            )).replace(
+                'bingobongo@yamdb.fake,user,', 'bingobongo@yamdb.fake,user,Био'
+            ),
+            encoding='utf-8'
+        )
+        with open(tmp_path / 'genre.csv', 'a', encoding='utf-8') as file:
+            file.write('\n100,Новый жанр,new-genre\n')
+        with open(tmp_path / 'review.csv', encoding='utf-8',
+                  newline='') as file:
+            reviews = list(csv.DictReader(file))
+        reviews[0]['score'] = '1'
+        with open(tmp_path / 'review.csv', 'w', encoding='utf-8',
+                  newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=reviews[0].keys())
+            writer.writeheader()
+            writer.writerows(reviews)
+        comments = (tmp_path / 'comments.csv').read_text(encoding='utf-8')
+        (tmp_path / 'comments.csv').write_text(
+            comments.rsplit('\n', 1)[0], encoding='utf-8'
+        )
+        comment_titles = dict(
+            Comment.objects.values_list('pk', 'review__title_id')
+        )
+        call_command(
+            'import_csv', '--dir', str(tmp_path), '--upsert',
+            '--delete-missing'
+        )
+        output = capsys.readouterr().out
+        assert 'Title: добавлено 0, изменено 1' in output
+        assert 'Genre: добавлено 1, изменено 0' in output
+        assert Title.objects.get(pk=1).name == 'Побег'
+        assert User.objects.get(pk=100).bio == 'Био'
+        assert dict(User.objects.filter(pk__in=(100, 101)).values_list(
+            'pk', 'token_version'
+        )) == {100: 0, 101: 1}, (
+            'Проверьте, что смена роли при импорте отзывает токены '
+            'пользователя, а изменения других полей - нет.'
+        )
+        assert Comment.objects.count() == 2, (
+            'Проверьте, что --delete-missing удаляет строки, которых нет '
+            'в источнике.'
+        )
+        assert Review.objects.count() == 72
+        changed_title = int(reviews[0]['title_id'])
+        # Удалённый комментарий меняет версию своего произведения сигналом.
+        removed = set(comment_titles).difference(
+            Comment.objects.values_list('pk', flat=True)
+        )
+        assert {
+            pk for pk, version in Title.objects.values_list('pk', 'version')
+            if version != versions[pk]
+        } == {1, changed_title} | {comment_titles[pk] for pk in removed}, (
+            'Проверьте, что --upsert пересчитывает рейтинг только '
+            'произведений с изменившимися отзывами.'
+        )
+        title = Title.objects.get(pk=changed_title)
+        scores = list(title.reviews.values_list('score', flat=True))
+        assert title.rating == sum(scores) / len(scores)
+        review = Comment.objects.first().review
+        assert review.comment_count == review.comments.count()
+
+    def test_07_export_csv_round_trip(self, tmp_path):
+        call_command('import_csv')
+        call_command('export_csv', '--dir', str(tmp_path), '--gzip')
+        with gzip.open(tmp_path / 'review.csv.gz', 'rt',
+                       encoding='utf-8') as file:
+            assert file.readline().strip() == (
+                'id,title_id,text,author,score,pub_date'
+            )
+
+        call_command('flush', '--no-input')
+        call_command('import_csv', '--dir', str(tmp_path))
+        assert Review.objects.count() == 72
+        assert str(Comment.objects.get(pk=1).pub_date.date()) == (
+            '2020-01-13'
+        ), 'Проверьте, что выгрузка читается командой import_csv.'
+
+    def test_08_export_endpoint(self, admin_client, user_client):
+        call_command('import_csv')
+        url = '/api/v1/export/'
+        assert user_client.get(f'{url}?file=titles').status_code == 403, (
+            f'Проверьте, что `{url}` доступен только администратору.'
+        )
+        assert admin_client.get(f'{url}?file=nope').status_code == 400
+
+        response = admin_client.get(f'{url}?file=titles')
+        assert response.status_code == 200
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0] == 'id,name,year,category'
+        assert len(lines) == 33
+
+        response = admin_client.get(f'{url}?file=genre&compress=gzip')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        assert content.decode().startswith('id,name,slug')
+
+    def test_09_import_csv_upsert_changes_etags(self, tmp_path, client):
+        source = Path(settings.BASE_DIR) / 'static' / 'data'
+        call_command('import_csv')
+        urls = [f'/api/v1/titles/{title_id}/' for title_id in (2, 3, 10)]
+        etags = {url: client.get(url)['ETag'] for url in urls}
+
+        for path in source.glob('*.csv'):
+            shutil.copy(path, tmp_path / path.name)
+        titles = (tmp_path / 'titles.csv').read_text(encoding='utf-8')
+        (tmp_path / 'titles.csv').write_text(
+            titles.replace('Крестный отец', 'Крёстный отец'),
+            encoding='utf-8'
+        )
+        links = (tmp_path / 'genre_title.csv').read_text(encoding='utf-8')
+        (tmp_path / 'genre_title.csv').write_text(''.join(
+            line for line in links.splitlines(keepends=True)
+            if not line.startswith('3,3,')
+        ), encoding='utf-8')
+        call_command(
+            'import_csv', '--dir', str(tmp_path), '--upsert',
+            '--delete-missing'
+        )
+
+        renamed, relinked, untouched = urls
+        response = client.get(renamed, HTTP_IF_NONE_MATCH=etags[renamed])
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что --upsert меняет `ETag` переименованного '
+            'произведения.'
+        )
+        assert response.json()['name'] == 'Крёстный отец', (
+            'Проверьте, что импорт сбрасывает кэш ответов API.'
+        )
+        response = client.get(relinked, HTTP_IF_NONE_MATCH=etags[relinked])
+        assert response.status_code == HTTPStatus.OK, (
+            'Проверьте, что удаление связи с жанром меняет `ETag` '
+            'произведения.'
+        )
+        response = client.get(untouched, HTTP_IF_NONE_MATCH=etags[untouched])
+        assert response.status_code == HTTPStatus.NOT_MODIFIED
@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+from django.db import connection, connections, transaction
+
+from api.replica import SNAPSHOT_TABLE, ReadReplicaRouter, refresh_replica
+from reviews.models import Category, Title
+
+
+class Test09SQLiteProfile:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            assert cursor.fetchone()[0] == 1, (
+                'Проверьте, что соединение открывается с synchronous=NORMAL.'
+            )
+            cursor.execute('PRAGMA busy_timeout')
+            assert cursor.fetchone()[0] == 5000
+            cursor.execute('PRAGMA cache_size')
+            assert cursor.fetchone()[0] == -64 * 1024
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_concurrent_writers(self):
+        category = Category.objects.create(name='Фильм', slug='movie')
+        title = Title.objects.create(name='Фильм', year=2000,
+                                     category=category)
+        errors = []
+
+        def write():
+            try:
+                for _ in range(20):
+                    with transaction.atomic():
+                        Title.objects.filter(pk=title.pk).touch()
+                    Title.objects.filter(pk=title.pk).touch()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=write) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors, (
+            'Проверьте, что одновременные записи выстраиваются в очередь, '
+            f'а не падают: {errors[:1]}'
+        )
+        title.refresh_from_db()
+        assert title.version == 8 * 20 * 2
+
+    def test_03_replica_backup(self, tmp_path):
+        source = tmp_path / 'db.sqlite3'
+        target = tmp_path / 'replica.sqlite3'
+        with sqlite3.connect(source) as db:
+            db.execute('CREATE TABLE item (name TEXT)')
+            db.execute("INSERT INTO item VALUES ('первый')")
+        started = time.time()
+        refresh_replica(source, target)
+        with sqlite3.connect(target) as db:
+            assert db.execute('SELECT name FROM item').fetchall() == [
+                ('первый',)
+            ], 'Проверьте, что реплика получает копию основной базы.'
+            (refreshed,), = db.execute(
+                f'SELECT refreshed FROM {SNAPSHOT_TABLE}'
+            ).fetchall()
+        assert refreshed >= started, (
+            'Проверьте, что время снимка записывается в файл реплики: '
+            'его должны видеть все процессы.'
+        )
+
+    @pytest.mark.django_db(
+        transaction=True, databases=['default', 'replica']
+    )
+    def test_04_read_routing(self, settings, client, user_client,
+                             monkeypatch):
+        settings.READ_REPLICA = 'replica'
+        aliases = []
+        db_for_read = ReadReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            aliases.append(alias)
+            return alias
+
+        def take_snapshot(refreshed):
+            # В тестах реплика смотрит на ту же базу, что и основная.
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {SNAPSHOT_TABLE}')
+                cursor.execute(
+                    f'INSERT INTO {SNAPSHOT_TABLE} VALUES (%s)', [refreshed]
+                )
+
+        monkeypatch.setattr(ReadReplicaRouter, 'db_for_read', spy)
+        category = Category.objects.create(name='Фильм', slug='movie')
+        title = Title.objects.create(name='Фильм', year=2000,
+                                     category=category)
+        url = f'/api/v1/titles/{title.pk}/reviews/'
+
+        user_client.get(url)
+        assert 'replica' not in aliases, (
+            'Без снимка чтение должно идти в основную базу.'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {SNAPSHOT_TABLE} (refreshed REAL NOT NULL)'
+            )
+        try:
+            take_snapshot(time.time() - settings.REPLICA_MAX_LAG - 1)
+            user_client.get(url)
+            assert 'replica' not in aliases, (
+                'Проверьте, что устаревший снимок не используется.'
+            )
+            take_snapshot(time.time())
+            assert user_client.get(url).status_code == HTTPStatus.OK
+            assert 'replica' in aliases, (
+                'Проверьте, что GET-запросы отзывов читаются из реплики.'
+            )
+
+            response = user_client.post(
+                url, data={'text': 'Отзыв', 'score': 5}
+            )
+            assert response.status_code == HTTPStatus.CREATED
+            aliases.clear()
+            assert len(user_client.get(url).json()['results']) == 1
+            assert 'replica' not in aliases, (
+                'После записи пользователь должен читать из основной базы, '
+                'пока реплика его не догонит.'
+            )
+            take_snapshot(time.time() + 1)
+            aliases.clear()
+            user_client.get(url)
+            assert 'replica' in aliases
+
+            assert client.get('/api/v1/titles/')['X-Cache'] == 'MISS'
+            assert client.get('/api/v1/titles/')['X-Cache'] == 'HIT'
+            take_snapshot(time.time() + 2)
+            assert client.get('/api/v1/titles/')['X-Cache'] == 'MISS', (
+                'Проверьте, что ответы из реплики кэшируются отдельно '
+                'для каждого снимка.'
+            )
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {SNAPSHOT_TABLE}')